@@ -0,0 +1,64 @@
+import hashlib
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_TIMEOUT = 60 * 10
+TOKEN_KEY = 'api:token:{}'
+TOKEN_VERSION_KEY = 'api:token_version:{}'
+# Поля пользователя, которые хранятся в кэше. Пароля среди них нет:
+# остальные поля загрузятся из базы, только если к ним обратятся.
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email',
+               'is_active', 'is_staff', 'is_superuser')
+
+
+def token_cache_keys(key):
+    # В ключи кэша попадает не сам токен, а его хэш.
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return TOKEN_KEY.format(digest), TOKEN_VERSION_KEY.format(digest)
+
+
+def cached_fields(User):
+    # from_db() ждёт значения в порядке полей модели.
+    return [field.attname for field in User._meta.concrete_fields
+            if field.attname in USER_FIELDS]
+
+
+def forget_token(key):
+    """Сделать устаревшей запись кэша о токене key."""
+    cache.set(token_cache_keys(key)[1], uuid.uuid4().hex, None)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающий пользователя токена в кэше.
+
+    Стандартный класс на каждый запрос выполняет JOIN authtoken_token
+    с auth_user; здесь пользователь читается из кэша вместе с версией
+    токена. Сигналы api.signals после коммита меняют версию при
+    изменении токена или его пользователя, а версия читается до
+    запроса к базе: запись, собранная из данных до изменения, уже не
+    совпадёт с ней. Неактивные пользователи в кэш не попадают: их
+    отклоняет TokenAuthentication.
+    """
+
+    def authenticate_credentials(self, key):
+        entry_key, version_key = token_cache_keys(key)
+        cached = cache.get_many([entry_key, version_key])
+        version = cached.get(version_key)
+        entry = cached.get(entry_key)
+        if version is not None and entry is not None and entry[0] == version:
+            User = get_user_model()
+            user = User.from_db(router.db_for_read(User),
+                                cached_fields(User), entry[1])
+            return user, self.get_model()(key=key, user=user)
+        if version is None:
+            cache.add(version_key, uuid.uuid4().hex, None)
+            version = cache.get(version_key)
+        user, token = super().authenticate_credentials(key)
+        values = tuple(getattr(user, field)
+                       for field in cached_fields(type(user)))
+        cache.set(entry_key, (version, values), TOKEN_CACHE_TIMEOUT)
+        return user, token
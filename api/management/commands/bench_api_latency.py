@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.benchmark import measure, rolled_back
+from posts.models import Comment, Follow, Group, Post, User
+from posts.pagination import POSTS_PER_PAGE
+
+# Медианное время ответа страницы API, мс.
+LATENCY_BUDGET_MS = 200
+
+
+class Command(BaseCommand):
+    help = ('Измерить время ответа списков API и сравнить его '
+            'с бюджетом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=POSTS_PER_PAGE * 5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--budget', type=float,
+                            default=LATENCY_BUDGET_MS,
+                            help='Бюджет медианного ответа, мс')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            reader = User.objects.create(username='bench_api_reader')
+            author = User.objects.create(username='bench_api_author')
+            group = Group.objects.create(title='bench', slug='bench-api',
+                                         description='bench')
+            Follow.objects.create(user=reader, author=author)
+            posts = Post.objects.bulk_create(
+                Post(text=f'Пост номер {i} ' * 10, author=author,
+                     group=group)
+                for i in range(options['posts']))
+            post = Post.objects.filter(author=author).latest('pk')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=reader, text=f'Комментарий {i}')
+                for i in range(len(posts)))
+            token = Token.objects.create(user=reader)
+
+            guest = APIClient()
+            authorized = APIClient()
+            authorized.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            endpoints = (
+                (reverse('api:posts-list'), guest),
+                (reverse('api:posts-list') + f'?group={group.slug}', guest),
+                (reverse('api:comments-list', args=(post.pk,)), guest),
+                (reverse('api:groups-list'), guest),
+                (reverse('api:feed-list'), authorized),
+                (reverse('api:follow-list'), authorized),
+            )
+            results = {}
+            # Как в продакшене: без debug toolbar и журнала SQL.
+            with override_settings(DEBUG=False):
+                for url, client in endpoints:
+                    results[url] = measure(lambda: client.get(url),
+                                           options['repeat'])
+
+        budget = options['budget']
+        lines = [f'Медианное время ответа, бюджет {budget:g} мс:']
+        for url, ms in results.items():
+            mark = '' if ms <= budget else '  — превышен'
+            lines.append(f'  {url}: {ms:.1f} мс{mark}')
+        self.stdout.write('\n'.join(lines))
+        if any(ms > budget for ms in results.values()):
+            raise CommandError('Время ответа API превышает бюджет')
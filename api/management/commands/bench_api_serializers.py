@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api import fast
+from api.pagination import MAX_PAGE_SIZE
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import PostSerializer
+from posts.benchmark import measure, rolled_back
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнить PostSerializer и сериализацию через values() '
+            'на странице постов API')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        size = options['page_size']
+        request = Request(RequestFactory().get('/api/v1/posts/'))
+        with rolled_back():
+            author = User.objects.create(username='bench_serializers')
+            group = Group.objects.create(title='bench', slug='bench',
+                                         description='bench')
+            Post.objects.bulk_create(
+                Post(text=f'Пост номер {i} ' * 10, author=author,
+                     group=group)
+                for i in range(size))
+            posts = Post.objects.filter(author=author)
+
+            def generic_page():
+                serializer = PostSerializer(
+                    list(posts.feed()[:size]), many=True,
+                    context={'request': request})
+                JSONRenderer().render(serializer.data)
+
+            def fast_page():
+                rows = list(fast.post_values(posts)[:size])
+                FastJSONRenderer().render(
+                    fast.post_rows(rows, request))
+
+            generic_ms = measure(generic_page, options['repeat'])
+            fast_ms = measure(fast_page, options['repeat'])
+
+        encoder = 'orjson' if orjson is not None else 'json'
+        self.stdout.write(
+            f'Страница из {size} постов:\n'
+            f'  PostSerializer + JSONRenderer: {generic_ms:.2f} мс '
+            f'({1000 / generic_ms:.0f} стр/с)\n'
+            f'  values() + {encoder}: {fast_ms:.2f} мс '
+            f'({1000 / fast_ms:.0f} стр/с), '
+            f'в {generic_ms / fast_ms:.1f} раза быстрее')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from api.authentication import CachedTokenAuthentication, forget_token
+from posts.benchmark import measure, rolled_back
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнить число запросов и время проверки токена '
+            'для TokenAuthentication и CachedTokenAuthentication')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with rolled_back():
+            user = User.objects.create(username='bench_token_auth')
+            token = Token.objects.create(user=user)
+            request = RequestFactory().get(
+                '/', HTTP_AUTHORIZATION=f'Token {token.key}')
+            forget_token(token.key)
+
+            results = {}
+            for label, authentication in (
+                    ('TokenAuthentication', TokenAuthentication()),
+                    ('CachedTokenAuthentication',
+                     CachedTokenAuthentication())):
+                def authenticate():
+                    for _ in range(count):
+                        authentication.authenticate(Request(request))
+
+                with CaptureQueriesContext(connection) as context:
+                    authenticate()
+                results[label] = (len(context),
+                                  measure(authenticate, options['repeat']))
+
+        lines = [f'Проверка токена в {count} запросах:']
+        for label, (queries, ms) in results.items():
+            lines.append(f'  {label}: {queries} SQL-запросов, '
+                         f'{ms / count * 1000:.1f} мкс на запрос')
+        self.stdout.write('\n'.join(lines))
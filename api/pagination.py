@@ -0,0 +1,49 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from posts.pagination import POSTS_PER_PAGE, CursorPaginator
+
+MAX_PAGE_SIZE = 100
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация API поверх posts.pagination.CursorPaginator.
+
+    Порядок берётся из атрибута ordering представления, размер
+    страницы — из ?limit= (не больше MAX_PAGE_SIZE). Ответ содержит
+    ссылки next и previous с параметром ?cursor=, COUNT(*) не
+    выполняется.
+    """
+    page_size = POSTS_PER_PAGE
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, self.get_page_size(request),
+                                    ordering=view.ordering)
+        self.page = paginator.get_page(
+            request.query_params.get(self.cursor_query_param))
+        return list(self.page)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
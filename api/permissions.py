@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+
+class IsAuthorOrReadOnly(permissions.IsAuthenticatedOrReadOnly):
+    """Читать могут все, создавать — вошедшие пользователи, а менять
+    и удалять объект — только его автор."""
+
+    def has_object_permission(self, request, view, obj):
+        return (request.method in permissions.SAFE_METHODS
+                or obj.author_id == request.user.pk)
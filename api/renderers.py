@@ -0,0 +1,25 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, кодирующий ответ через orjson, если он установлен.
+
+    Без orjson и для данных, которые orjson не умеет кодировать
+    (например, ленивые строки перевода в ошибках), работает обычный
+    JSONRenderer. Отступы из Accept при этом не поддерживаются.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
@@ -0,0 +1,90 @@
+from rest_framework import serializers
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def requested_fields(request):
+    """Поля из ?fields=id,text или None, если параметра нет.
+
+    Разреженный набор полей действует только на чтение: при записи
+    сериализатору нужны все поля.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Оставляет в ответе только поля, перечисленные в ?fields=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class SanitizedImageField(serializers.ImageField):
+    """Картинка поста, которую отдают только после того, как воркер
+    перекодировал её без метаданных: до этого в хранилище лежит файл
+    в том виде, в каком его загрузили."""
+
+    def get_attribute(self, instance):
+        if not instance.renditions:
+            return None
+        return super().get_attribute(instance)
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    image = SanitizedImageField(read_only=True)
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+    group = serializers.SlugRelatedField(slug_field='slug',
+                                         queryset=Group.objects.all(),
+                                         required=False, allow_null=True)
+
+    class Meta:
+        model = Post
+        fields = ('id', 'text', 'author', 'group', 'pub_date', 'image',
+                  'comment_count')
+
+
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Group
+        fields = ('id', 'title', 'slug', 'description')
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'post', 'author', 'text', 'created')
+        read_only_fields = ('post',)
+
+
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field='username',
+                                        read_only=True)
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          queryset=User.objects.all())
+
+    class Meta:
+        model = Follow
+        fields = ('user', 'author')
+
+    def validate_author(self, author):
+        user = self.context['request'].user
+        if author == user:
+            raise serializers.ValidationError(
+                'Нельзя подписаться на самого себя.')
+        if Follow.objects.filter(user=user, author=author).exists():
+            raise serializers.ValidationError(
+                'Вы уже подписаны на этого автора.')
+        return author
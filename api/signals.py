@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+
+User = get_user_model()
+
+
+def forget_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list(
+            'key', flat=True):
+        forget_token(key)
+
+
+# Версии меняются после коммита: запрос, прочитавший пользователя до
+# него, не оставит в кэше устаревшую запись.
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: forget_token(key))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: forget_user_tokens(user_id))
@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import (CachedTokenAuthentication, forget_token,
+                                token_cache_keys)
+from posts.models import User
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Читатель',
+                                            password='Тестовый пароль')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('api:follow-list')
+
+    def get(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client.get(self.url)
+
+    def token_queries(self, key):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(key)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in context.captured_queries
+                if 'authtoken_token' in query['sql']]
+
+    def test_token_is_read_from_cache(self):
+        """Повторный запрос с токеном не обращается к authtoken_token"""
+        self.assertEqual(len(self.token_queries(self.token.key)), 1)
+        self.assertEqual(self.token_queries(self.token.key), [])
+
+    def test_cache_is_invalidated(self):
+        """Удалённый токен и выключенный пользователь перестают
+        проходить проверку сразу"""
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+
+        Token.objects.get(key=self.token.key).delete()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get(token.key).status_code, 200)
+
+    def test_password_is_not_cached(self):
+        """В кэше нет хэша пароля, а пользователь из кэша загрузит
+        остальные поля из базы, только если к ним обратятся"""
+        self.get(self.token.key)
+        entry = cache.get(token_cache_keys(self.token.key)[0])
+        self.assertNotIn(self.user.password, entry[1])
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key)
+        self.assertEqual((user.pk, user.username),
+                         (self.user.pk, self.user.username))
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_change_during_lookup_is_not_cached(self):
+        """Запись, прочитанная из базы до изменения пользователя,
+        не остаётся в кэше"""
+        lookup = TokenAuthentication.authenticate_credentials
+
+        def changed_meanwhile(authentication, key):
+            result = lookup(authentication, key)
+            forget_token(key)
+            return result
+
+        with mock.patch.object(TokenAuthentication,
+                               'authenticate_credentials',
+                               changed_meanwhile):
+            self.get(self.token.key)
+        self.assertEqual(len(self.token_queries(self.token.key)), 1)
+
+    def test_unknown_token(self):
+        """Неизвестный токен отклоняется"""
+        self.assertEqual(self.get('unknown').status_code, 401)
@@ -0,0 +1,109 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from api import fast
+from api.pagination import MAX_PAGE_SIZE
+from api.renderers import FastJSONRenderer
+from api.serializers import PostSerializer
+from posts.models import Follow, Group, Post, User
+from posts.timeline import timeline_posts
+
+
+class FastSerializationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Читатель')
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст {index}', author=cls.author,
+                 group=cls.group if index % 2 else None)
+            for index in range(MAX_PAGE_SIZE))
+        # Имя файла без самого файла: URL строится хранилищем.
+        first, second = Post.objects.order_by('pk')[:2]
+        Post.objects.filter(pk=first.pk).update(
+            image='posts/test.gif', renditions='{}')
+        # Картинка, которую воркер ещё не перекодировал.
+        Post.objects.filter(pk=second.pk).update(image='posts/raw.gif')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.request = Request(RequestFactory().get('/'))
+
+    def generic(self, queryset, fields=None):
+        request = self.request
+        if fields is not None:
+            request = Request(RequestFactory().get('/', {'fields': fields}))
+        posts = queryset.order_by('-pub_date', '-id')[:MAX_PAGE_SIZE]
+        return json.loads(JSONRenderer().render(PostSerializer(
+            posts, many=True, context={'request': request}).data))
+
+    def test_lists_match_post_serializer(self):
+        """Списки постов совпадают с выводом PostSerializer"""
+        lists = (
+            ('api:posts-list', {}, Post.objects.all()),
+            ('api:posts-list', {'group': self.group.slug},
+             Post.objects.filter(group=self.group)),
+            ('api:posts-list', {'author': self.author.username},
+             Post.objects.filter(author=self.author)),
+            ('api:feed-list', {}, timeline_posts(self.user)),
+        )
+        for name, params, queryset in lists:
+            with self.subTest(name=name, params=params):
+                response = self.client.get(
+                    reverse(name), {'limit': MAX_PAGE_SIZE, **params})
+                self.assertTrue(response.json()['results'])
+                self.assertEqual(response.json()['results'],
+                                 self.generic(queryset))
+        for fields in ('id,pub_date', 'author,group,image', 'text,unknown'):
+            with self.subTest(fields=fields):
+                response = self.client.get(reverse('api:posts-list'),
+                                           {'limit': MAX_PAGE_SIZE,
+                                            'fields': fields})
+                self.assertEqual(response.json()['results'],
+                                 self.generic(Post.objects.all(), fields))
+
+    def test_unsanitized_image_is_not_published(self):
+        """URL картинки появляется только после её перекодирования"""
+        response = self.client.get(reverse('api:posts-list'),
+                                   {'limit': MAX_PAGE_SIZE})
+        images = {post['id']: post['image']
+                  for post in response.json()['results']}
+        first, second = Post.objects.order_by('pk')[:2]
+        self.assertTrue(images[first.pk].endswith('/media/posts/test.gif'))
+        self.assertIsNone(images[second.pk])
+        self.assertIsNone(self.generic(Post.objects.filter(
+            pk=second.pk))[0]['image'])
+
+    def test_renderer_without_orjson(self):
+        """Без orjson ответ кодируется стандартным json"""
+        rows = fast.post_rows(fast.post_values(Post.objects.all()),
+                              self.request)
+        with mock.patch('api.renderers.orjson', None):
+            encoded = FastJSONRenderer().render(rows)
+        self.assertEqual(json.loads(encoded), json.loads(
+            FastJSONRenderer().render(rows)))
+
+    def test_page_is_one_query(self):
+        """Страница из MAX_PAGE_SIZE постов собирается одним запросом;
+        сравнение скорости с PostSerializer — в bench_api_serializers"""
+        with self.assertNumQueries(1):
+            FastJSONRenderer().render(fast.post_rows(
+                fast.post_values(Post.objects.all())[:MAX_PAGE_SIZE],
+                self.request))
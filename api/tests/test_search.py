@@ -0,0 +1,38 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.pagination import POSTS_PER_PAGE
+
+
+class SearchApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Тестовый автор')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_is_public_and_paginated(self):
+        """Поиск доступен без токена и листается ссылкой next"""
+        posts = [
+            Post.objects.create(text=f'Фотографии звёздного неба {index}',
+                                author=self.author)
+            for index in range(POSTS_PER_PAGE + 2)
+        ]
+        Post.objects.create(text='Ничего интересного', author=self.author)
+        found = []
+        url = reverse('api:search') + '?' + urlencode(
+            {'q': 'фотография неба'})
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            found += [item['id'] for item in data['results']]
+            self.assertEqual(data['results'][0]['author'],
+                             self.author.username)
+            url = data['next']
+        self.assertEqual(sorted(found), [post.pk for post in posts])
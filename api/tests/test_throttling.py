@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.models import Post, User
+
+RATE_LIMITS = {
+    'post': {'user': '30/h'},
+    'comment': {'user': '1/h'},
+    'follow': {'user': '30/h'},
+    'api': {'user': '5/m', 'ip': '3/m'},
+}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS)
+class ThrottlingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Читатель')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_api_budget(self):
+        """Запросы к API ограничены бюджетом api и показывают остаток
+        в заголовках"""
+        url = reverse('api:posts-list')
+        remaining = [self.client.get(url)['X-RateLimit-Remaining']
+                     for _ in range(3)]
+        self.assertEqual(remaining, ['2', '1', '0'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_writes_share_site_budget(self):
+        """Комментарий через API расходует тот же бюджет, что и форма
+        на сайте"""
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_comment',
+                                 args=(self.user.username, self.post.pk)),
+                         {'text': 'С сайта'})
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('api:comments-list', args=(self.post.pk,)),
+            {'text': 'Из API'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.post.comments.count(), 1)
@@ -0,0 +1,176 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication
+from api.pagination import MAX_PAGE_SIZE
+from posts.models import Comment, Follow, Group, Post, User
+from posts.pagination import POSTS_PER_PAGE
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Читатель')
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [
+            Post.objects.create(text=f'Тестовый текст {index}',
+                                author=cls.author, group=cls.group)
+            for index in range(POSTS_PER_PAGE + 5)
+        ]
+        cls.post = cls.posts[-1]
+        for index in range(3):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {index}')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = APIClient()
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Токен постоянного клиента уже лежит в кэше.
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+    def endpoints(self):
+        """Списки API: адрес, клиент и число SQL-запросов на страницу."""
+        return (
+            (reverse('api:posts-list'), self.guest_client, 1),
+            (reverse('api:posts-list') + '?group=test-slug',
+             self.guest_client, 1),
+            (reverse('api:comments-list', args=(self.post.pk,)),
+             self.guest_client, 2),
+            (reverse('api:groups-list'), self.guest_client, 1),
+            (reverse('api:feed-list'), self.authorized_client, 2),
+            (reverse('api:follow-list'), self.authorized_client, 1),
+        )
+
+    def walk(self, url, client):
+        """Все объекты списка, пройденного по ссылкам next."""
+        results = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            results += response.json()['results']
+            url = response.json()['next']
+        return results
+
+    def test_list_queries_do_not_depend_on_rows(self):
+        """Число запросов страницы не растёт с числом объектов"""
+        for url, client, queries in self.endpoints():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+        for index in range(5):
+            Comment.objects.create(post=self.post, author=self.author,
+                                   text=f'Ещё комментарий {index}')
+        other = User.objects.create(username='Другой автор')
+        Follow.objects.create(user=self.user, author=other)
+        Post.objects.create(text='Ещё пост', author=other, group=self.group)
+        for url, client, queries in self.endpoints():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+    def test_posts_cursor_pagination(self):
+        """Посты листаются курсором без пропусков и повторов"""
+        results = self.walk(reverse('api:posts-list') + '?limit=4',
+                            self.guest_client)
+        self.assertEqual([item['id'] for item in results],
+                         [post.pk for post in reversed(self.posts)])
+        response = self.guest_client.get(reverse('api:posts-list'),
+                                         {'limit': MAX_PAGE_SIZE + 1})
+        self.assertEqual(len(response.json()['results']), len(self.posts))
+        self.assertIsNone(response.json()['next'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только нужные поля и лишние JOIN"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(reverse('api:posts-list'),
+                                             {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        self.assertNotIn('JOIN', context.captured_queries[0]['sql'])
+        response = self.guest_client.get(reverse('api:posts-list'),
+                                         {'fields': 'id,author'})
+        self.assertEqual(response.json()['results'][0],
+                         {'id': self.post.pk,
+                          'author': self.author.username})
+
+    def test_post_permissions(self):
+        """Пост создаёт вошедший пользователь, а меняет только автор"""
+        url = reverse('api:posts-list')
+        data = {'text': 'Пост из API', 'group': self.group.slug}
+        self.assertEqual(self.guest_client.post(url, data).status_code, 401)
+        response = self.authorized_client.post(url, data)
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual((post.author, post.group, post.text),
+                         (self.user, self.group, data['text']))
+        foreign = reverse('api:posts-detail', args=(self.post.pk,))
+        response = self.authorized_client.patch(foreign, {'text': 'Чужой'})
+        self.assertEqual(response.status_code, 403)
+        own = reverse('api:posts-detail', args=(post.pk,))
+        response = self.authorized_client.patch(own, {'text': 'Правка'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authorized_client.delete(own).status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_comments(self):
+        """Комментарии поста читаются и добавляются через API"""
+        url = reverse('api:comments-list', args=(self.post.pk,))
+        response = self.authorized_client.post(url, {'text': 'Из API'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['post'], self.post.pk)
+        results = self.walk(url, self.guest_client)
+        self.assertEqual(results[0]['text'], 'Из API')
+        self.assertEqual(len(results), self.post.comments.count())
+        missing = reverse('api:comments-list', args=(0,))
+        self.assertEqual(self.guest_client.get(missing).status_code, 404)
+
+    def test_feed(self):
+        """Лента API содержит посты авторов из подписок"""
+        Post.objects.create(text='Чужой пост',
+                            author=User.objects.create(username='Чужой'))
+        results = self.walk(reverse('api:feed-list'), self.authorized_client)
+        self.assertEqual([item['id'] for item in results],
+                         [post.pk for post in reversed(self.posts)])
+        response = self.guest_client.get(reverse('api:feed-list'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_follow(self):
+        """Подписка создаётся один раз, не на себя и удаляется
+        по имени автора"""
+        other = User.objects.create(username='Другой автор')
+        url = reverse('api:follow-list')
+        cases = (
+            (other.username, 201),
+            (other.username, 400),
+            (self.user.username, 400),
+            ('Нет такого', 400),
+        )
+        for username, status in cases:
+            with self.subTest(username=username):
+                response = self.authorized_client.post(url,
+                                                       {'author': username})
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(
+            [item['author'] for item in self.walk(url,
+                                                  self.authorized_client)],
+            [self.author.username, other.username])
+        response = self.authorized_client.delete(
+            reverse('api:follow-detail', args=(other.username,)))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.user,
+                                               author=other).exists())
@@ -0,0 +1,25 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from posts import ratelimit
+
+
+class RateLimitThrottle(BaseThrottle):
+    """Троттлинг API бюджетами posts.ratelimit.
+
+    Каждый запрос расходует бюджет api, а запись — ещё и бюджет
+    rate_limit_scope представления, общий с формами сайта.
+    """
+
+    def allow_request(self, request, view):
+        scopes = ['api']
+        scope = getattr(view, 'rate_limit_scope', None)
+        if scope is not None and request.method not in SAFE_METHODS:
+            scopes.append(scope)
+        self.usage = ratelimit.check(request, *scopes)
+        # Заголовки добавит RateLimitHeadersMiddleware.
+        request._request.rate_limit = self.usage
+        return self.usage is None or self.usage.allowed
+
+    def wait(self):
+        return self.usage.reset
@@ -0,0 +1,19 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = 'api'
+
+router = DefaultRouter()
+router.register('posts', views.PostViewSet, basename='posts')
+router.register(r'posts/(?P<post_id>\d+)/comments', views.CommentViewSet,
+                basename='comments')
+router.register('feed', views.FeedViewSet, basename='feed')
+router.register('groups', views.GroupViewSet, basename='groups')
+router.register('follow', views.FollowViewSet, basename='follow')
+
+urlpatterns = [
+    path('v1/search/', views.search, name='search'),
+    path('v1/', include(router.urls)),
+]
@@ -0,0 +1,174 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from posts.models import Follow, Group, Post
+from posts.search import find_posts
+from posts.timeline import timeline_posts
+
+from . import fast
+from .pagination import KeysetPagination
+from .permissions import IsAuthorOrReadOnly
+from .renderers import FastJSONRenderer
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, PostSerializer, requested_fields)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search(request):
+    query = request.query_params.get('q', '').strip()
+    page = find_posts(query, request.query_params.get('cursor'))
+    next_url = None
+    if page.has_next():
+        next_url = replace_query_param(request.build_absolute_uri(),
+                                       'cursor', page.next_cursor)
+    serializer = PostSerializer(page, many=True,
+                                context={'request': request})
+    return Response({'next': next_url, 'results': serializer.data})
+
+
+class SparseQuerySetMixin:
+    """Подгружает через select_related только связи запрошенных полей.
+
+    related_fields сопоставляет поле сериализатора со связью, без
+    которой оно потребовало бы отдельного запроса на каждый объект.
+    """
+    related_fields = {}
+
+    def select_related_fields(self, queryset):
+        fields = requested_fields(self.request)
+        related = [relation for field, relation in self.related_fields.items()
+                   if fields is None or field in fields]
+        # select_related() без аргументов подгрузил бы все связи.
+        return queryset.select_related(*related) if related else queryset
+
+
+class FastPostListMixin:
+    """Список постов без PostSerializer: строки values() сразу
+    становятся словарями ответа (см. api.fast)."""
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    def list(self, request, *args, **kwargs):
+        fields = requested_fields(request)
+        rows = fast.post_values(self.get_queryset(), fields)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(
+            fast.post_rows(page, request, fields))
+
+
+class PostViewSet(FastPostListMixin, SparseQuerySetMixin,
+                  viewsets.ModelViewSet):
+    """Посты; ?group=<slug> и ?author=<username> сужают список."""
+    serializer_class = PostSerializer
+    permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = KeysetPagination
+    ordering = ('-pub_date', '-id')
+    related_fields = {'author': 'author', 'group': 'group'}
+    rate_limit_scope = 'post'
+
+    def get_queryset(self):
+        queryset = Post.objects.all()
+        group = self.request.query_params.get('group')
+        if group:
+            queryset = queryset.filter(group__slug=group)
+        author = self.request.query_params.get('author')
+        if author:
+            queryset = queryset.filter(author__username=author)
+        return self.select_related_fields(queryset)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+
+class FeedViewSet(FastPostListMixin, SparseQuerySetMixin,
+                  mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Лента подписок пользователя, как на странице follow_index."""
+    serializer_class = PostSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-pub_date', '-id')
+    related_fields = {'author': 'author', 'group': 'group'}
+
+    def get_queryset(self):
+        return self.select_related_fields(timeline_posts(self.request.user))
+
+
+class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    permission_classes = (AllowAny,)
+    pagination_class = KeysetPagination
+    ordering = ('id',)
+
+
+class CommentViewSet(SparseQuerySetMixin, viewsets.ModelViewSet):
+    serializer_class = CommentSerializer
+    permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = KeysetPagination
+    ordering = ('-created', '-id')
+    related_fields = {'author': 'author'}
+    rate_limit_scope = 'comment'
+
+    def get_post(self):
+        if not hasattr(self, '_post'):
+            self._post = get_object_or_404(
+                Post.objects.only('pk'), pk=self.kwargs['post_id'])
+        return self._post
+
+    def get_queryset(self):
+        return self.select_related_fields(self.get_post().comments.all())
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=self.get_post())
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+
+class FollowViewSet(SparseQuerySetMixin, mixins.ListModelMixin,
+                    mixins.CreateModelMixin, mixins.DestroyModelMixin,
+                    viewsets.GenericViewSet):
+    """Подписки пользователя; удаление — по имени автора."""
+    serializer_class = FollowSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # Внутри подписок одного пользователя автор уникален, и страница
+    # читается по индексу ограничения (user, author).
+    ordering = ('author',)
+    related_fields = {'user': 'user', 'author': 'author'}
+    rate_limit_scope = 'follow'
+    lookup_field = 'author__username'
+    lookup_url_kwarg = 'username'
+
+    def get_queryset(self):
+        return self.select_related_fields(
+            Follow.objects.filter(user=self.request.user))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
@@ -1,14 +1,61 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, Profile, Task
+from .pagination import CachedCountList
+
+# С какого числа строк по статистике PostgreSQL список без фильтров
+# считается приблизительно.
+ESTIMATE_THRESHOLD = 100000
+
+# Области invalidate_counts(), которые сбрасывают сигналы моделей;
+# количество в остальных списках пересчитывается по таймауту.
+COUNT_SCOPES = {Post: 'index', Comment: 'comments', Follow: 'follows'}
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки без COUNT(*) на каждый запрос.
+
+    Количество берётся из кэша, как у лент (CachedCountList), а для
+    большой таблицы без фильтров в PostgreSQL — из статистики
+    планировщика pg_class.reltuples.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row is not None and row[0] >= ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return CachedCountList(queryset,
+                               COUNT_SCOPES.get(queryset.model)).count()
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%'.
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
@@ -19,16 +66,51 @@ class GroupAdmin(admin.ModelAdmin):
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'author', 'text', 'created')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'followers_count',
+                    'following_count')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user',)
+    # Счётчики ведут сигналы и repair_counters, а не правка руками.
+    readonly_fields = ('posts_count', 'followers_count', 'following_count')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at',
+                    'finished_at')
+    list_filter = ('status',)
+    search_fields = ('key',)
+    readonly_fields = ('name', 'args', 'key', 'attempts', 'locked_at',
+                       'finished_at', 'created', 'error')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Profile, ProfileAdmin)
+admin.site.register(Task, TaskAdmin)
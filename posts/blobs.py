@@ -0,0 +1,73 @@
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import ImageBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def _increment(name, **fields):
+    updates = {field: F(field) + 1 for field in fields}
+    updated = ImageBlob.objects.filter(name=name).update(**updates)
+    if not updated:
+        _, created = ImageBlob.objects.get_or_create(
+            name=name, defaults=dict.fromkeys(fields, 1))
+        if not created:
+            ImageBlob.objects.filter(name=name).update(**updates)
+
+
+def hold(name):
+    """Не удалять файл name, пока не сохранён пост, для которого он
+    загружен.
+
+    Хранилище вызывает это перед тем, как проверить, есть ли уже такой
+    файл: если delete_unreferenced() удалит его раньше, файл будет
+    записан заново, а если позже — увидит загрузку и оставит файл.
+    """
+    _increment(name, pending=1)
+
+
+def acquire(name):
+    """Учесть ещё одну ссылку на файл картинки name; загрузка этого
+    файла, если она была, больше не удерживает его."""
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + 1, pending=Greatest(F('pending') - 1, 0))
+    if not updated:
+        _increment(name, refcount=1)
+
+
+def release(name):
+    """Убрать ссылку на файл name; файл без ссылок удаляется после
+    коммита транзакции."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name).update(
+        refcount=Greatest(F('refcount') - 1, 0))
+    transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def delete_unreferenced(name):
+    """Удалить файл name, если на него не ссылается ни один пост и его
+    не загружают заново.
+
+    Строка ImageBlob блокируется до конца удаления файла, так что
+    hold() для этого файла дождётся его и запишет файл снова. Варианты
+    картинки остаются до сборки мусора: у файлов со старыми именами
+    они могут быть общими с другими файлами.
+    """
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+        if (blob is None or blob.refcount or blob.pending
+                or Post.objects.filter(image=name).exists()):
+            return
+        blob.delete()
+        try:
+            Post._meta.get_field('image').storage.delete(name)
+        except (OSError, SuspiciousFileOperation):
+            logger.exception('Не удалось удалить файл %s', name)
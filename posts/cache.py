@@ -0,0 +1,67 @@
+import uuid
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'posts:generation:{}'
+
+
+def get_generation(*scopes):
+    """Текущее поколение данных для набора областей.
+
+    Поколение входит в ключи закэшированных фрагментов: после
+    bump_generation() любой из областей старые фрагменты перестают
+    находиться и вытесняются из кэша по TTL.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys
+               if key not in generations}
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return '.'.join(generations[key] for key in keys)
+
+
+def bump_generation(*scopes):
+    """Сделать устаревшими фрагменты, зависящие от областей scopes."""
+    if scopes:
+        cache.set_many({GENERATION_KEY.format(scope): uuid.uuid4().hex
+                        for scope in scopes}, None)
+
+
+PAGE_SCOPE = 'page:{}'
+
+
+def tag_page(request, *keys, posts=()):
+    """Пометить ответ суррогатными ключами для кэша страниц.
+
+    Только помеченные ответы попадают в PageCacheMiddleware; после
+    purge_pages() с любым из ключей закэшированная страница
+    перестаёт отдаваться. Ключи постов страницы posts вычисляются
+    после рендеринга, чтобы не выполнять запрос заранее: post:<id>,
+    а также user_name:<id> и group_name:<id> для имён авторов и
+    названий групп в карточках.
+    """
+    request.surrogate_keys = [*getattr(request, 'surrogate_keys', ()),
+                              *keys]
+    request.surrogate_posts = posts
+
+
+def surrogate_keys(request):
+    keys = getattr(request, 'surrogate_keys', [])
+    posts = getattr(request, 'surrogate_posts', ())
+    post_keys = {}
+    for post in posts:
+        post_keys[f'post:{post.pk}'] = None
+        post_keys[f'user_name:{post.author_id}'] = None
+        if post.group_id is not None:
+            post_keys[f'group_name:{post.group_id}'] = None
+    return [*keys, *post_keys]
+
+
+def page_generation(keys):
+    return get_generation(*(PAGE_SCOPE.format(key) for key in keys))
+
+
+def purge_pages(*keys):
+    bump_generation(*(PAGE_SCOPE.format(key) for key in keys))
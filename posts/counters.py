@@ -0,0 +1,72 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def _count(model, field, outer):
+    """Коррелированный подзапрос COUNT(*) строк model,
+    у которых field равно полю outer внешнего запроса."""
+    counts = (model.objects.filter(**{field: OuterRef(outer)}).order_by()
+              .values(field).annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def profile_counts():
+    return {
+        'posts_count': _count(Post, 'author', 'user_id'),
+        'followers_count': _count(Follow, 'author', 'user_id'),
+        'following_count': _count(Follow, 'user', 'user_id'),
+    }
+
+
+def post_counts():
+    return {
+        'comment_count': _count(Comment, 'post', 'pk'),
+    }
+
+
+def repair(queryset, counts, dry_run=False):
+    """Пересчитать счётчики в строках queryset, где они разошлись
+    с реальными значениями. Возвращает число исправленных строк."""
+    actual = {f'actual_{name}': value for name, value in counts.items()}
+    drift = Q()
+    for name in counts:
+        drift |= ~Q(**{name: F(f'actual_{name}')})
+    drifted = (queryset.annotate(**actual).filter(drift)
+               .values_list('pk', flat=True))
+    if dry_run:
+        return drifted.count()
+    return (queryset.model.objects.filter(pk__in=list(drifted))
+            .update(**counts))
+
+
+def create_missing_profiles():
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    profiles = Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in missing])
+    return len(profiles)
+
+
+def adjust_profile(user_id, **deltas):
+    """Атомарно изменить счётчики профиля на deltas.
+
+    Если профиля нет (пользователь создан в обход сигналов), при
+    увеличении счётчика он создаётся и пересчитывается целиком. При
+    уменьшении профиль не создаётся: он может удаляться каскадом
+    вместе с пользователем.
+    """
+    updated = Profile.objects.filter(user_id=user_id).update(**{
+        name: Greatest(F(name) + delta, 0)
+        for name, delta in deltas.items()
+    })
+    growing = any(delta > 0 for delta in deltas.values())
+    if not updated and growing and User.objects.filter(pk=user_id).exists():
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(**profile_counts())
+
+
+def adjust_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0))
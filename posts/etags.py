@@ -0,0 +1,86 @@
+import hashlib
+
+from django.middleware.csrf import get_token
+
+from .cache import get_generation, page_generation
+from .models import Follow, Group, Post, User
+from .pagination import paginate
+from .timeline import follow_scopes, popular_authors
+
+# ETag страниц считается до рендеринга по поколениям тех же
+# суррогатных ключей, по которым сбрасывается кэш страниц: они меняются
+# при любом изменении показанных постов, включая редактирование и
+# комментарии. Last-Modified не отдаётся: pub_date при редактировании
+# не меняется, и ответ 304 по If-Modified-Since оказался бы устаревшим.
+
+
+def _etag(request, generation, *state):
+    """ETag страницы для пользователя запроса.
+
+    Страницы вошедшего пользователя содержат формы с CSRF-токеном,
+    поэтому в ETag входит секрет токена: после входа он меняется,
+    и браузер не получит 304 со старой формой. state — данные
+    зрителя, от которых зависит страница, например подписка.
+    """
+    parts = [request.user.pk, request.get_full_path(), generation, *state]
+    if request.user.is_authenticated:
+        get_token(request)
+        parts.append(request.META['CSRF_COOKIE'])
+    data = ':'.join(str(part) for part in parts)
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def _page_keys(request, post_list, scope):
+    """Ключи post:<id> постов запрошенной страницы.
+
+    Страница выбирается тем же paginate(), что и в представлении, но
+    читаются только id и pub_date, а COUNT(*) берётся из кэша.
+    """
+    _, page = paginate(request,
+                       post_list.select_related(None).only('pub_date'),
+                       scope=scope)
+    return [f'post:{post.pk}' for post in page]
+
+
+def index_etag(request):
+    return _etag(request, get_generation('index', 'names'))
+
+
+def group_etag(request, slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('pk', flat=True).first())
+    if group_id is None:
+        return None
+    scope = f'group:{group_id}'
+    keys = _page_keys(request, Post.objects.filter(group=group_id), scope)
+    return _etag(request, page_generation([scope, *keys]))
+
+
+def profile_etag(request, username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    if author_id is None:
+        return None
+    scope = f'author:{author_id}'
+    keys = _page_keys(request, Post.objects.filter(author=author_id), scope)
+    # Кнопка подписки меняется сразу, а не после сброса ключей задачей.
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author=author_id).exists())
+    return _etag(request, page_generation([scope, *keys]), following)
+
+
+def post_etag(request, username, post_id):
+    try:
+        author_id = (Post.objects.values_list('author_id', flat=True)
+                     .get(author__username=username, pk=post_id))
+    except Post.DoesNotExist:
+        return None
+    return _etag(request,
+                 page_generation([f'post:{post_id}', f'author:{author_id}']))
+
+
+def follow_etag(request):
+    popular = popular_authors(request.user)
+    return _etag(request, get_generation(*follow_scopes(request.user,
+                                                        popular)))
@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Comment, Post
+from .uploads import check_format
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +9,21 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['group', 'text', 'image', ]
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        """Показать ошибку, из-за которой картинка была отклонена
+        ещё при загрузке, и проверить, что формат новой картинки можно
+        перекодировать без метаданных."""
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        image = self.cleaned_data.get('image')
+        if image and 'image' in self.changed_data:
+            check_format(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
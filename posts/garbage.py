@@ -0,0 +1,121 @@
+import re
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default as sorl
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+from .renditions import LEGACY_THUMBNAIL
+
+
+def walk(storage, path, after=()):
+    """Файлы каталога path в хранилище в порядке сортировки путей.
+
+    after — путь, разбитый на части: файлы до него включительно
+    пропускаются, а каталоги целиком до него даже не читаются, поэтому
+    продолжение обхода с контрольной точки стоит немногим дороже.
+    """
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    entries = sorted([(name, True) for name in directories]
+                     + [(name, False) for name in files])
+    for name, is_directory in entries:
+        full_name = f'{path}/{name}'
+        key = tuple(full_name.split('/'))
+        if is_directory:
+            if key >= after[:len(key)]:
+                yield from walk(storage, full_name, after)
+        elif key > after:
+            yield full_name
+
+
+def referenced_images(names):
+    """Какие из файлов names — картинки постов."""
+    used = set(Post.objects.filter(image__in=names)
+               .values_list('image', flat=True))
+    used.update(ImageBlob.objects.filter(name__in=names, refcount__gt=0)
+                .values_list('name', flat=True))
+    return used
+
+
+RENDITION_DIRECTORY = re.compile(r'renditions/[^/"]+/')
+
+
+def rendition_references():
+    """Функция проверки вариантов картинок.
+
+    Каталоги renditions/<хеш>/, на которые ссылаются посты или
+    ImageBlob, собираются один раз за проход одним чтением каждой
+    таблицы, а не поиском LIKE по каждой пачке файлов.
+    """
+    used = set()
+    for model in (Post, ImageBlob):
+        texts = (model.objects.exclude(renditions='')
+                 .values_list('renditions', flat=True))
+        for text in texts.iterator():
+            used.update(RENDITION_DIRECTORY.findall(text))
+    return lambda names: {name for name in names
+                          if name.rsplit('/', 1)[0] + '/' in used}
+
+
+def legacy_thumbnail_name(image):
+    """Имя файла, под которым sorl сохранил бы LEGACY_THUMBNAIL для image.
+
+    Повторяет вычисление опций из ThumbnailBackend.get_thumbnail, но
+    не обращается ни к KV-хранилищу, ни к самой картинке. Публичный
+    get_thumbnail() создал бы недостающие миниатюры, поэтому сборщик
+    мусора — единственное место, которое опирается на внутренние
+    методы sorl.
+    """
+    backend = sorl.backend
+    source = ImageFile(image)
+    geometry, options = LEGACY_THUMBNAIL
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def thumbnail_references():
+    """Функция проверки миниатюр sorl: они нужны только постам, у
+    которых ещё нет вариантов из posts.renditions. Читаются только
+    имена картинок, по частям."""
+    storage = Post._meta.get_field('image').storage
+    images = (Post.objects.filter(renditions='').exclude(image='')
+              .exclude(image=None).values_list('image', flat=True))
+    used = {legacy_thumbnail_name(ImageFile(name, storage))
+            for name in images.iterator()}
+    return lambda names: used.intersection(names)
+
+
+def delete_thumbnail(storage, name):
+    """Удалить миниатюру sorl вместе с её записью в KV-хранилище,
+    иначе {% thumbnail %} продолжил бы отдавать ссылку на файл."""
+    sorl.kvstore.delete(ImageFile(name, storage), delete_thumbnails=False)
+    storage.delete(name)
+
+
+def delete_file(storage, name):
+    storage.delete(name)
+
+
+def roots():
+    """Каталоги, где собирается мусор: (каталог, хранилище, функция,
+    возвращающая используемые файлы из списка, функция удаления)."""
+    return [
+        (sorl_settings.THUMBNAIL_PREFIX.strip('/'), sorl.storage,
+         thumbnail_references(), delete_thumbnail),
+        ('posts', Post._meta.get_field('image').storage, referenced_images,
+         delete_file),
+        ('renditions', default_storage, rendition_references(),
+         delete_file),
+    ]
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from posts.benchmark import measure, rolled_back
+from posts.models import Post, User
+from posts.pagination import POSTS_PER_PAGE, CursorPaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнить время выдачи глубокой страницы ленты '
+            'для OFFSET- и курсорной пагинации')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--page', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        page_number = options['page']
+        with rolled_back():
+            author = User.objects.create(username='bench_pagination')
+            Post.objects.bulk_create(
+                (Post(text=str(i), author=author)
+                 for i in range(options['posts']))
+            )
+            post_list = Post.objects.feed()
+
+            def offset_page():
+                paginator = Paginator(post_list, POSTS_PER_PAGE)
+                list(paginator.get_page(page_number))
+
+            offset = (page_number - 1) * POSTS_PER_PAGE - 1
+            paginator = CursorPaginator(post_list, POSTS_PER_PAGE)
+            cursor = paginator.encode_cursor(
+                post_list.order_by(*paginator.ordering)[offset])
+
+            def cursor_page():
+                list(paginator.get_page(cursor))
+
+            offset_ms = measure(offset_page, options['repeat'])
+            cursor_ms = measure(cursor_page, options['repeat'])
+
+        self.stdout.write(
+            f'Страница {page_number} из {options["posts"]} постов:\n'
+            f'  OFFSET: {offset_ms:.2f} мс\n'
+            f'  cursor: {cursor_ms:.2f} мс'
+        )
@@ -0,0 +1,71 @@
+from io import BytesIO
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from posts.pagination import POSTS_PER_PAGE
+from posts.renditions import (CARD_SIZE, FALLBACK_TYPE, WIDTHS,
+                              available_formats, render)
+
+# Ширина колонки в CSS-пикселях и плотность пикселей экрана.
+VIEWPORTS = {
+    'телефон 360px @2x': (360, 2),
+    'планшет 768px @1x': (768, 1),
+    'десктоп 1280px @1x': (1280, 1),
+}
+
+
+def pick_width(css_width, density):
+    """Ширина из WIDTHS, которую браузер выберет из srcset."""
+    needed = min(css_width, CARD_SIZE[0]) * density
+    return next((width for width in WIDTHS if width >= needed), WIDTHS[-1])
+
+
+def legacy_size(image):
+    """Размер миниатюры, которую создавал {% thumbnail %} с
+    настройками sorl по умолчанию: JPEG 960x339 с качеством 95."""
+    output = BytesIO()
+    ImageOps.fit(image, CARD_SIZE, Image.LANCZOS).save(
+        output, 'JPEG', quality=95)
+    return len(output.getvalue())
+
+
+class Command(BaseCommand):
+    help = ('Сравнить объём картинок на странице ленты для одной '
+            'JPEG-миниатюры 960x339 и вариантов из srcset')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'images', nargs='*',
+            help='Файлы картинок; по умолчанию синтетическая картинка',
+        )
+
+    def handle(self, *args, **options):
+        if options['images']:
+            images = [Image.open(path) for path in options['images']]
+            images = [ImageOps.exif_transpose(image).convert('RGB')
+                      for image in images]
+        else:
+            images = [Image.effect_mandelbrot(
+                (1600, 900), (-2, -1.2, 1, 1.2), 100).convert('RGB')]
+        page = list(islice(cycle(images), POSTS_PER_PAGE))
+
+        legacy = sum(legacy_size(image) for image in page)
+        self.stdout.write(f'Страница из {POSTS_PER_PAGE} постов:\n'
+                          f'  JPEG 960x339: {legacy / 1024:.0f} КБ')
+
+        sizes = {}
+        for image in images:
+            for mime in available_formats():
+                for width in WIDTHS:
+                    sizes[id(image), mime, width] = len(
+                        render(image, width, mime))
+        best = available_formats()[0]
+        for viewport, (css_width, density) in VIEWPORTS.items():
+            width = pick_width(css_width, density)
+            for mime in dict.fromkeys([best, FALLBACK_TYPE]):
+                total = sum(sizes[id(image), mime, width] for image in page)
+                self.stdout.write(
+                    f'  {viewport}, {mime} {width}w: {total / 1024:.0f} КБ '
+                    f'({total / legacy:.0%})')
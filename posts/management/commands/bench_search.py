@@ -0,0 +1,72 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.benchmark import measure, rolled_back
+from posts.cache import bump_generation
+from posts.models import Post, User
+from posts.pagination import POSTS_PER_PAGE
+
+WORDS = ('кот', 'котики', 'собака', 'собаки', 'погода', 'погоду', 'город',
+         'городе', 'новости', 'новость', 'программирование', 'программист',
+         'книга', 'книги', 'читаю', 'читали', 'красивый', 'красивая',
+         'сегодня', 'вчера', 'утром', 'вечером', 'лето', 'зима', 'море',
+         'гулять', 'гуляли', 'работа', 'работаю', 'друзья')
+RARE_WORD = 'телескопы'
+
+
+class Command(BaseCommand):
+    help = ('Сравнить поиск по полнотекстовому индексу с поиском '
+            'LIKE по тексту постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--words', type=int, default=12,
+                            help='Слов в одном посте')
+        parser.add_argument('--rare-every', type=int, default=10000,
+                            help='Каждый какой пост содержит редкое слово')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        with rolled_back():
+            author = User.objects.create(username='bench_search')
+            for start in range(0, options['posts'], 10000):
+                stop = min(start + 10000, options['posts'])
+                Post.objects.bulk_create(
+                    Post(text=self.text(generator, i, options), author=author)
+                    for i in range(start, stop))
+            search.rebuild()
+
+            results = {}
+            for label, query in (('частое слово', 'котик'),
+                                 ('редкое слово', 'телескоп')):
+                def like_page():
+                    list(Post.objects.feed().filter(text__icontains=query)
+                         [:POSTS_PER_PAGE])
+
+                def index_page():
+                    bump_generation(search.SEARCH_SCOPE)
+                    list(search.find_posts(query))
+
+                def cached_page():
+                    list(search.find_posts(query))
+
+                results[label] = (measure(like_page, options['repeat']),
+                                  measure(index_page, options['repeat']),
+                                  measure(cached_page, options['repeat']))
+
+        lines = [f'Первая страница поиска среди {options["posts"]} постов:']
+        for label, (like_ms, index_ms, cached_ms) in results.items():
+            lines.append(f'  {label}: LIKE {like_ms:.2f} мс, '
+                         f'индекс {index_ms:.2f} мс, '
+                         f'из кэша {cached_ms:.2f} мс')
+        self.stdout.write('\n'.join(lines))
+
+    @staticmethod
+    def text(generator, number, options):
+        words = generator.choices(WORDS, k=options['words'])
+        if number % options['rare_every'] == 0:
+            words.append(RARE_WORD)
+        return ' '.join(words)
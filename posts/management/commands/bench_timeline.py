@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.benchmark import measure, rolled_back
+from posts.models import Follow, Post, Profile, User
+from posts.pagination import POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Сравнить чтение ленты подписок через JOIN с Follow и через '
+            'материализованную ленту')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--others', type=int, default=20000,
+                            help='Посты авторов вне подписок')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            reader = User.objects.create(username='bench_timeline')
+            User.objects.bulk_create(
+                User(username=f'bench_timeline_{i}')
+                for i in range(options['authors'] + 1))
+            authors = list(User.objects.filter(
+                username__startswith='bench_timeline_'))
+            stranger = authors.pop()
+            Profile.objects.bulk_create(
+                Profile(user=author, followers_count=1) for author in authors)
+            Follow.objects.bulk_create(
+                Follow(user=reader, author=author) for author in authors)
+            Post.objects.bulk_create(
+                Post(text=str(i), author=author)
+                for author in authors
+                for i in range(options['posts_per_author']))
+            Post.objects.bulk_create(
+                Post(text=str(i), author=stranger)
+                for i in range(options['others']))
+            timeline.rebuild(reader.pk)
+
+            def join_page():
+                posts = Post.objects.filter(author__following__user=reader)
+                list(posts.feed()[:POSTS_PER_PAGE])
+
+            def timeline_page():
+                list(timeline.timeline_posts(reader).feed()[:POSTS_PER_PAGE])
+
+            join_ms = measure(join_page, options['repeat'])
+            timeline_ms = measure(timeline_page, options['repeat'])
+
+        self.stdout.write(
+            f'Первая страница ленты при {len(authors)} подписках:\n'
+            f'  JOIN Follow: {join_ms:.2f} мс\n'
+            f'  timeline:    {timeline_ms:.2f} мс'
+        )
@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from posts.garbage import roots, walk
+
+CHECKPOINT_FILE = '.collect_garbage.json'
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Удалить картинки, варианты и миниатюры, на которые больше '
+            'не ссылается ни один пост')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их посты могут '
+                 'быть ещё не сохранены',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать файлы, которые были бы удалены',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать обход заново, а не с контрольной точки',
+        )
+
+    def handle(self, *args, **options):
+        self.checkpoint_path = os.path.join(settings.MEDIA_ROOT,
+                                            CHECKPOINT_FILE)
+        # Для каждого каталога — последний проверенный файл или None,
+        # если каталог пройден целиком.
+        self.checkpoint = {}
+        if not options['restart'] and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as file:
+                self.checkpoint = json.load(file)
+            self.stdout.write('Продолжение с контрольной точки')
+        deadline = timezone.now() - timedelta(seconds=options['min_age'])
+
+        total_removed = total_size = 0
+        for root, storage, referenced, delete in roots():
+            if root in self.checkpoint and self.checkpoint[root] is None:
+                continue
+            removed, reclaimed = self.collect(
+                root, storage, referenced, delete, deadline, options)
+            total_removed += removed
+            total_size += reclaimed
+
+        if os.path.exists(self.checkpoint_path) and not options['dry_run']:
+            os.remove(self.checkpoint_path)
+        self.stdout.write(
+            f'Всего освобождено: {filesizeformat(total_size)} '
+            f'({total_size} байт) в {total_removed} файлах')
+
+    def collect(self, root, storage, referenced, delete, deadline, options):
+        """Обойти каталог root с его контрольной точки; вернуть число
+        удалённых файлов и их объём."""
+        after = self.checkpoint.get(root)
+        after = tuple(after.split('/')) if after else ()
+        checked = removed = reclaimed = 0
+        for batch in batches(walk(storage, root, after),
+                             options['batch_size']):
+            used = referenced(batch)
+            for name in batch:
+                if name in used:
+                    continue
+                if storage.get_modified_time(name) > deadline:
+                    continue
+                reclaimed += storage.size(name)
+                removed += 1
+                if not options['dry_run']:
+                    delete(storage, name)
+            checked += len(batch)
+            self.save_checkpoint(root, batch[-1], options)
+        self.save_checkpoint(root, None, options)
+        verb = 'можно удалить' if options['dry_run'] else 'удалено'
+        self.stdout.write(
+            f'{root}: проверено {checked}, {verb} {removed} '
+            f'({filesizeformat(reclaimed)})')
+        return removed, reclaimed
+
+    def save_checkpoint(self, root, last_name, options):
+        if options['dry_run']:
+            return
+        self.checkpoint[root] = last_name
+        with open(self.checkpoint_path, 'w') as file:
+            json.dump(self.checkpoint, file)
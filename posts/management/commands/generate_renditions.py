@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import renditions
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создать миниатюры для картинок постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры и для постов, у которых они есть',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            posts = posts.filter(renditions='')
+        created = failed = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            try:
+                renditions.generate(post_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Пост {post_id}: {error}')
+            else:
+                created += 1
+        self.stdout.write(f'Обработано постов: {created}, ошибок: {failed}')
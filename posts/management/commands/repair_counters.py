@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import (create_missing_profiles, post_counts,
+                            profile_counts, repair)
+from posts.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать денормализованные счётчики профилей и постов '
+            'и исправить расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать строки с расхождениями',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if not dry_run:
+            created = create_missing_profiles()
+            self.stdout.write(f'Создано профилей: {created}')
+        for model, counts in ((Profile, profile_counts()),
+                              (Post, post_counts())):
+            fixed = 0
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            for start in range(0, last_pk, options['batch_size']):
+                batch = model.objects.filter(
+                    pk__gt=start, pk__lte=start + options['batch_size'])
+                with transaction.atomic():
+                    fixed += repair(batch, counts, dry_run=dry_run)
+            verb = 'Расхождений' if dry_run else 'Исправлено'
+            self.stdout.write(f'{verb} в {model.__name__}: {fixed}')
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import queue
+
+
+class Command(BaseCommand):
+    help = 'Выполнять фоновые задачи из очереди posts.queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Сколько секунд ждать новых задач, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                released = queue.release_stale()
+                if released:
+                    self.stdout.write(f'Возвращено в очередь: {released}')
+                processed = queue.work(options['batch_size'])
+                total += processed
+                if processed:
+                    continue
+                queue.purge_finished()
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Выполнено задач: {total}')
@@ -0,0 +1,108 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from .cache import page_generation, surrogate_keys
+from .ratelimit import add_headers
+
+PAGE_KEY = 'posts:page:{}'
+PAGE_STATS_KEY = 'posts:page_stats:{}'
+
+
+def _count(name):
+    key = PAGE_STATS_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def page_cache_stats():
+    """Число попаданий и промахов кэша страниц."""
+    names = ('hits', 'misses')
+    values = cache.get_many([PAGE_STATS_KEY.format(name) for name in names])
+    return {name: values.get(PAGE_STATS_KEY.format(name), 0)
+            for name in names}
+
+
+class PageCacheMiddleware:
+    """Кэш целых страниц для анонимных посетителей.
+
+    Кэшируются только GET-ответы представлений, пометивших себя через
+    posts.cache.tag_page() суррогатными ключами (id постов, автора,
+    группы). Вместе со страницей хранится поколение её ключей: сигналы
+    моделей вызывают purge_pages(), и страница с любым из изменённых
+    ключей при следующем запросе рендерится заново. Заголовок X-Cache
+    показывает HIT или MISS, счётчики доступны через page_cache_stats().
+
+    Должен стоять после AuthenticationMiddleware и MessageMiddleware:
+    страницы посетителей с непоказанными сообщениями не кэшируются
+    и не отдаются из кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+    def __call__(self, request):
+        if (request.method != 'GET' or request.user.is_authenticated
+                or len(get_messages(request))):
+            return self.get_response(request)
+
+        path = request.get_full_path().encode()
+        key = PAGE_KEY.format(hashlib.md5(path).hexdigest())
+        entry = cache.get(key)
+        if (entry is not None
+                and entry['generation'] == page_generation(entry['keys'])):
+            _count('hits')
+            response = HttpResponse(entry['content'],
+                                    status=entry['status'])
+            for header, value in entry['headers']:
+                response[header] = value
+            response = get_conditional_response(
+                request, etag=response.get('ETag'), response=response)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = self.get_response(request)
+        keys = surrogate_keys(request)
+        if not keys or not self._is_cacheable(request, response):
+            return response
+        _count('misses')
+        cache.set(key, {
+            'keys': keys,
+            'generation': page_generation(keys),
+            'status': response.status_code,
+            'headers': list(response.items()),
+            'content': response.content,
+        }, self.timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def _is_cacheable(request, response):
+        return (response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED')
+                and not len(get_messages(request)))
+
+
+class RateLimitHeadersMiddleware:
+    """Заголовки X-RateLimit-* для запросов, посчитанных
+    posts.ratelimit: декоратором rate_limit или троттлингом API."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        usage = getattr(request, 'rate_limit', None)
+        if usage is not None:
+            add_headers(response, usage)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:21
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+
+    references = (Post.objects.exclude(image='').exclude(image=None)
+                  .order_by().values('image').annotate(count=Count('pk')))
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=row['image'], refcount=row['count'])
+         for row in references])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('pending', models.PositiveIntegerField(default=0, verbose_name='Загрузок без поста')),
+                ('renditions', models.TextField(blank=True, default='', verbose_name='Варианты')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите картинку', null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_blobs, migrations.RunPython.noop),
+    ]
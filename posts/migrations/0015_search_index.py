@@ -0,0 +1,91 @@
+import re
+from itertools import chain, islice
+
+from django.db import migrations
+
+from posts.stemmer import stem
+
+WORD = re.compile(r'\w+')
+
+SQL = {
+    'sqlite': (
+        'CREATE VIRTUAL TABLE posts_search'
+        ' USING fts5(post_id UNINDEXED, text, comments)',
+        'DROP TABLE posts_search',
+    ),
+    'postgresql': (
+        'CREATE TABLE posts_search ('
+        ' post_id integer PRIMARY KEY'
+        ' REFERENCES posts_post (id) ON DELETE CASCADE'
+        ' DEFERRABLE INITIALLY DEFERRED,'
+        ' document tsvector NOT NULL);'
+        'CREATE INDEX posts_search_document_idx'
+        ' ON posts_search USING gin (document);'
+        'CREATE TABLE comments_search ('
+        ' comment_id integer PRIMARY KEY'
+        ' REFERENCES posts_comment (id) ON DELETE CASCADE'
+        ' DEFERRABLE INITIALLY DEFERRED,'
+        ' post_id integer NOT NULL,'
+        ' document tsvector NOT NULL);'
+        'CREATE INDEX comments_search_document_idx'
+        ' ON comments_search USING gin (document);'
+        'INSERT INTO posts_search (post_id, document)'
+        " SELECT id, setweight(to_tsvector('russian', text), 'A')"
+        ' FROM posts_post;'
+        'INSERT INTO comments_search (comment_id, post_id, document)'
+        " SELECT id, post_id, setweight(to_tsvector('russian', text), 'B')"
+        ' FROM posts_comment',
+        'DROP TABLE comments_search; DROP TABLE posts_search',
+    ),
+}
+
+
+def terms(text):
+    return ' '.join(stem(word) for word in WORD.findall(text))
+
+
+def fill_sqlite_index(apps, schema_editor):
+    # В SQLite нет русского стеммера: основы слов считаются здесь,
+    # как в posts.search.SQLiteIndex.
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    posts = ((2 * pk, pk, terms(text), '') for pk, text
+             in Post.objects.values_list('pk', 'text').iterator())
+    comments = ((2 * pk + 1, post_id, '', terms(text))
+                for pk, post_id, text in Comment.objects.values_list(
+                    'pk', 'post_id', 'text').iterator())
+    rows = chain(posts, comments)
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, 1000))
+            if not batch:
+                return
+            cursor.executemany(
+                'INSERT INTO posts_search (rowid, post_id, text, comments) '
+                'VALUES (%s, %s, %s, %s)', batch)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in SQL:
+        return
+    schema_editor.execute(SQL[vendor][0])
+    if vendor == 'sqlite':
+        fill_sqlite_index(apps, schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    sql = SQL.get(schema_editor.connection.vendor)
+    if sql is not None:
+        schema_editor.execute(sql[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
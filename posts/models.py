@@ -1,28 +1,62 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 Group = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты вместе с автором и группой."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Напишите свой прекрасный пост')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
     author = (models.ForeignKey(User, on_delete=models.CASCADE,
-              related_name='posts', verbose_name='Автор'))
+              related_name='posts', verbose_name='Автор', db_index=False))
     group = (models.ForeignKey('Group', on_delete=models.SET_NULL,
              related_name='posts', verbose_name='Группа',
              help_text='Выберите группу из списка (необязательно)',
-             blank=True, null=True))
+             blank=True, null=True, db_index=False))
     image = (models.ImageField(upload_to='posts/', blank=True, null=True,
+             storage=ContentAddressedStorage(),
              verbose_name='Картинка', help_text='Загрузите картинку'))
+    comment_count = models.PositiveIntegerField('Комментариев', default=0,
+                                                editable=False)
+    renditions = models.TextField('Миниатюры', blank=True, default='',
+                                  editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы автора и группы начинаются с внешнего ключа, поэтому
+        # отдельные индексы внешних ключей не нужны.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def rendition_urls(self):
+        """URL готовых миниатюр картинки по именам из
+        posts.renditions.RENDITIONS."""
+        return json.loads(self.renditions) if self.renditions else {}
+
 
 class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
@@ -36,7 +70,7 @@ class Group(models.Model):
 class Comment(models.Model):
     post = (models.ForeignKey('Post', on_delete=models.CASCADE,
             related_name='comments', verbose_name='Текст поста',
-            blank=True, null=True))
+            blank=True, null=True, db_index=False))
     author = (models.ForeignKey(User, on_delete=models.CASCADE,
               related_name='comments', verbose_name='Автор'))
     text = models.TextField('Комментарий', help_text='Прокомментируйте пост')
@@ -44,16 +78,129 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created'], name='comment_created_idx'),
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
     user = (models.ForeignKey(User, on_delete=models.CASCADE,
-            related_name='follower', verbose_name='Подписчик'))
+            related_name='follower', verbose_name='Подписчик',
+            db_index=False))
     author = (models.ForeignKey(User, on_delete=models.CASCADE,
               related_name='following', verbose_name='Автор'))
 
     class Meta:
-        models.UniqueConstraint(
-            fields=['user', 'author'],
-            name='unique_following'
-        )
+        # Индекс ограничения начинается с user и заменяет индекс
+        # внешнего ключа.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_following'
+            ),
+        ]
+
+
+class Profile(models.Model):
+    user = (models.OneToOneField(User, on_delete=models.CASCADE,
+            related_name='profile', verbose_name='Пользователь'))
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    user = (models.ForeignKey(User, on_delete=models.CASCADE,
+            related_name='timeline', verbose_name='Подписчик'))
+    post = (models.ForeignKey(Post, on_delete=models.CASCADE,
+            related_name='timeline_entries', verbose_name='Пост'))
+    author = (models.ForeignKey(User, on_delete=models.CASCADE,
+              related_name='+', verbose_name='Автор'))
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """Уникальный файл картинки в ContentAddressedStorage.
+
+    refcount — число постов с этой картинкой: файл удаляется, когда
+    на него не остаётся ссылок. pending — число загрузок файла, чьи
+    посты ещё не сохранены: такой файл тоже не удаляется. Варианты
+    картинки из posts.renditions хранятся здесь же и создаются один раз
+    для всех её постов.
+    """
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Ссылок', default=0)
+    pending = models.PositiveIntegerField('Загрузок без поста', default=0)
+    renditions = models.TextField('Варианты', blank=True, default='')
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """Отложенный вызов функции, зарегистрированной в posts.queue.
+
+    key — ключ идемпотентности: задача с тем же ключом не ставится
+    повторно, пока выполненная задача не удалена purge_finished().
+    pending_key — ключ слияния: он есть только у ожидающей задачи, и
+    такая же задача до её запуска не ставится, а после — ставится.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    args = models.TextField('Аргументы', default='[[], {}]')
+    key = models.CharField('Ключ', max_length=200, blank=True, null=True)
+    pending_key = models.CharField('Ключ ожидающей задачи', max_length=200,
+                                   blank=True, null=True)
+    status = models.CharField('Состояние', max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Попыток не больше',
+                                               default=1)
+    run_at = models.DateTimeField('Запустить не раньше',
+                                  default=timezone.now)
+    locked_at = models.DateTimeField('Взята в работу', blank=True,
+                                     null=True)
+    finished_at = models.DateTimeField('Завершена', blank=True, null=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    error = models.TextField('Ошибка', blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='unique_task_key'),
+            models.UniqueConstraint(fields=['pending_key'],
+                                    name='unique_pending_task_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
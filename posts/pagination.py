@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import json
+import uuid
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+COUNT_CACHE_TIMEOUT = 60 * 5
+COUNT_VERSION_KEY = 'posts:count_version:{}'
+
+
+def invalidate_counts(*scopes):
+    """Сбросить закэшированные COUNT(*) списков областей scopes.
+
+    Область — это лента ('index', 'group:<id>', 'author:<id>',
+    'follow:<id пользователя>') или список админки ('comments',
+    'follows'). Списки, которые при изменении никто не сбрасывает,
+    например ленты подписчиков автора нового поста, пересчитываются
+    через COUNT_CACHE_TIMEOUT секунд.
+    """
+    cache.set_many({COUNT_VERSION_KEY.format(scope): uuid.uuid4().hex
+                    for scope in scopes}, None)
+
+
+class CachedCountList:
+    """Обёртка над QuerySet для Paginator, отдающая COUNT(*) из кэша.
+
+    Количество пересчитывается раз в COUNT_CACHE_TIMEOUT секунд или
+    после invalidate_counts() для области scope, которую вызывают
+    сигналы постов, комментариев и подписок. Срезы проходят в QuerySet
+    без изменений.
+    """
+
+    def __init__(self, queryset, scope=None, timeout=COUNT_CACHE_TIMEOUT):
+        self.queryset = queryset
+        self.scope = scope
+        self.timeout = timeout
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        return self.queryset[index]
+
+    def count(self):
+        # values('pk') убирает из COUNT(*) аннотации ленты и JOIN-ы
+        # select_related, оставляя только фильтры.
+        count_queryset = self.queryset.values('pk').order_by()
+        sql = str(count_queryset.query).encode()
+        version = ''
+        if self.scope is not None:
+            version = cache.get_or_set(COUNT_VERSION_KEY.format(self.scope),
+                                       lambda: uuid.uuid4().hex, None)
+        key = (f'posts:count:{self.scope}:{version}:'
+               f'{hashlib.md5(sql).hexdigest()}')
+        return cache.get_or_set(key, count_queryset.count, self.timeout)
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page, которой
+    пользуются шаблоны, но вместо номеров страниц хранит курсоры.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Вместо OFFSET очередная страница выбирается условием вида
+    (pub_date, id) < (последний pub_date, последний id), поэтому
+    глубокие страницы читаются так же быстро, как первая, и
+    COUNT(*) не нужен. Последнее поле ordering должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, previous=False):
+        if isinstance(obj, dict):
+            # Строка values(): значения лежат под именами полей.
+            obj = SimpleNamespace(**{
+                self._get_field(name).attname: obj[name]
+                for name in self.fields
+            })
+        values = [
+            self._get_field(name).value_to_string(obj)
+            for name in self.fields
+        ]
+        data = json.dumps([values, previous]).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = base64.urlsafe_b64decode(cursor + padding)
+            values, previous = json.loads(data.decode())
+            position = [
+                self._get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            return None, False
+        if len(position) != len(self.fields):
+            return None, False
+        return position, bool(previous)
+
+    def get_page(self, cursor=None):
+        """Вернуть страницу после (или перед) курсором.
+
+        Некорректный курсор, как и в Paginator.get_page, приводит
+        к первой странице.
+        """
+        position, previous = (self.decode_cursor(cursor) if cursor
+                              else (None, False))
+        ordering = self.ordering
+        if previous:
+            ordering = tuple(self._reverse(name) for name in ordering)
+        queryset = self.object_list.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, position))
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if previous:
+            objects.reverse()
+
+        next_cursor = previous_cursor = None
+        if objects:
+            if has_more or previous:
+                next_cursor = self.encode_cursor(objects[-1])
+            if position is not None and (has_more or not previous):
+                previous_cursor = self.encode_cursor(objects[0],
+                                                     previous=True)
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+    def _get_field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _seek(self, ordering, position):
+        """Условие «строго после position» для заданного порядка."""
+        condition = Q()
+        for index, name in enumerate(ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': position[index]})
+            for prev_name, value in zip(ordering[:index], position):
+                step &= Q(**{prev_name.lstrip('-'): value})
+            condition |= step
+        return condition
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE, scope=None):
+    """Разбить object_list на страницы согласно параметрам запроса.
+
+    Параметр ?cursor= включает курсорную пагинацию, иначе
+    используется обычный Paginator с номером страницы ?page=
+    и количеством из кэша области scope (см. invalidate_counts).
+    """
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(object_list, per_page)
+        return paginator, paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(CachedCountList(object_list, scope), per_page)
+    return paginator, paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import traceback
+from datetime import timedelta
+from functools import wraps
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func=None, *, max_attempts=None, coalesce=False):
+    """Зарегистрировать функцию как фоновую задачу.
+
+    Функция остаётся обычной, а func.delay(*args, key=None, **kwargs)
+    ставит её вызов в очередь. Аргументы должны переживать JSON:
+    передаются id, а не объекты моделей. Задача может выполниться
+    повторно после сбоя, поэтому она должна быть идемпотентной либо
+    ставиться с ключом key, по которому повторная постановка
+    игнорируется. С coalesce=True вызов с теми же аргументами не
+    ставится, пока такой же ещё ждёт запуска.
+    """
+    if func is None:
+        return lambda func: task(func, max_attempts=max_attempts,
+                                 coalesce=coalesce)
+    name = f'{func.__module__}.{func.__name__}'
+    TASKS[name] = func
+
+    @wraps(func)
+    def delay(*args, key=None, **kwargs):
+        return enqueue(name, args, kwargs, key=key,
+                       max_attempts=max_attempts, coalesce=coalesce)
+
+    func.delay = delay
+    return func
+
+
+def run_local(name, data):
+    """Выполнить задачу в текущем процессе, записав ошибку в лог."""
+    args, kwargs = json.loads(data)
+    try:
+        resolve(name)(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', name)
+
+
+def enqueue(name, args=(), kwargs=None, key=None, max_attempts=None,
+            coalesce=False):
+    """Поставить задачу name в очередь.
+
+    В таблицу Task записывается строка, которая попадает в базу вместе
+    с текущей транзакцией: задача не потеряется и не выполнится для
+    откаченных изменений. Задача с уже известным ключом key не
+    ставится повторно, а с coalesce=True не ставится задача с теми же
+    аргументами, ещё не взятая в работу. При TASK_QUEUE = 'local'
+    (тесты) задача выполняется в текущем процессе после коммита
+    транзакции, а её ошибки только пишутся в лог.
+    """
+    data = json.dumps([list(args), kwargs or {}])
+    if settings.TASK_QUEUE == 'local':
+        transaction.on_commit(lambda: run_local(name, data))
+        return
+    Task.objects.bulk_create([Task(
+        name=name,
+        args=data,
+        key=key,
+        pending_key=pending_key(name, data) if coalesce else None,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )], ignore_conflicts=True)
+
+
+def pending_key(name, data):
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    return f'{name}:{digest}'
+
+
+def resolve(name):
+    if name not in TASKS:
+        # Задачи регистрируются при импорте своего модуля.
+        import_module(name.rpartition('.')[0])
+    return TASKS[name]
+
+
+def row_locks():
+    """Умеет ли база пропускать заблокированные строки
+    (SELECT ... FOR UPDATE SKIP LOCKED)."""
+    return connection.features.has_select_for_update_skip_locked
+
+
+def claim(batch_size):
+    """Забрать до batch_size готовых задач в работу.
+
+    Где есть SKIP LOCKED, воркеры выбирают задачи, пропуская строки,
+    заблокированные другими воркерами; иначе задача переходит
+    в RUNNING условным UPDATE. В обоих случаях одну задачу не возьмут
+    два воркера. Взятая задача теряет ключ слияния: вызов, поставленный
+    после её запуска, выполнится ещё раз.
+    """
+    now = timezone.now()
+    pending = (Task.objects.filter(status=Task.PENDING, run_at__lte=now)
+               .order_by('run_at', 'id'))
+    if row_locks():
+        with transaction.atomic():
+            claimed = list(pending.select_for_update(skip_locked=True)
+                           .values_list('pk', flat=True)[:batch_size])
+            Task.objects.filter(pk__in=claimed).update(
+                status=Task.RUNNING, locked_at=now, pending_key=None,
+                attempts=F('attempts') + 1)
+    else:
+        claimed = []
+        for pk in pending.values_list('pk', flat=True)[:batch_size]:
+            if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+                    status=Task.RUNNING, locked_at=now, pending_key=None,
+                    attempts=F('attempts') + 1):
+                claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def run(task):
+    """Выполнить задачу; вернуть True, если она завершилась успешно.
+
+    Где есть SKIP LOCKED, изменения задачи и отметка о выполнении
+    коммитятся одной транзакцией, которая держит блокировку строки
+    задачи: по ней release_stale() отличает живой воркер от упавшего.
+    В SQLite такая транзакция запирала бы базу для всех запросов, пока
+    идёт, например, нарезка миниатюр, поэтому задача выполняется вне
+    транзакции, а отметка ставится отдельным коротким UPDATE; от
+    повторного запуска медленной задачи там защищает только
+    TASK_TIMEOUT. После ошибки задача откладывается
+    на TASK_RETRY_DELAY * 2 ** (attempts - 1) секунд, а после
+    max_attempts попыток помечается FAILED.
+    """
+    try:
+        if row_locks():
+            with transaction.atomic():
+                Task.objects.select_for_update().filter(pk=task.pk).exists()
+                execute(task)
+        else:
+            execute(task)
+        return True
+    except Exception:
+        logger.exception('Задача %s (%s) не выполнена', task.pk, task.name)
+        error = traceback.format_exc()
+    if task.attempts >= task.max_attempts:
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.FAILED, finished_at=timezone.now(), error=error)
+    else:
+        delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.PENDING, error=error,
+            run_at=timezone.now() + timedelta(seconds=delay))
+    return False
+
+
+def execute(task):
+    """Вызвать функцию задачи и отметить задачу выполненной."""
+    args, kwargs = json.loads(task.args)
+    resolve(task.name)(*args, **kwargs)
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DONE, finished_at=timezone.now(), error='')
+
+
+def work(batch_size=100):
+    """Выполнить очередную пачку задач; вернуть их число."""
+    tasks = claim(batch_size)
+    for task in tasks:
+        run(task)
+    return len(tasks)
+
+
+def release_stale():
+    """Вернуть в очередь задачи упавших воркеров; вернуть их число.
+
+    Задача считается брошенной, если дольше TASK_TIMEOUT числится
+    выполняющейся, а её строку никто не держит: пока воркер жив, run()
+    держит блокировку, и медленная задача не запустится второй раз.
+    Без SKIP LOCKED (SQLite) run() строку не блокирует, и остаётся
+    только таймаут: он должен быть больше времени самой долгой задачи.
+    Задача, которая уже исчерпала попытки (например, роняет воркер
+    нехваткой памяти), помечается FAILED.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.TASK_TIMEOUT)
+    with transaction.atomic():
+        stale = Task.objects.filter(status=Task.RUNNING,
+                                    locked_at__lt=deadline)
+        if row_locks():
+            stale = stale.select_for_update(skip_locked=True)
+        ids = list(stale.values_list('pk', flat=True))
+        failed = Task.objects.filter(
+            pk__in=ids, attempts__gte=F('max_attempts')).update(
+            status=Task.FAILED, finished_at=timezone.now(),
+            error='Воркер не завершил задачу')
+        if failed:
+            logger.error('Задачи, ронявшие воркер, помечены FAILED: %s',
+                         failed)
+        return Task.objects.filter(pk__in=ids, status=Task.RUNNING).update(
+            status=Task.PENDING)
+
+
+def purge_finished():
+    """Удалить выполненные задачи старше TASK_RETENTION секунд; до
+    этого их ключи защищают от повторной постановки."""
+    deadline = timezone.now() - timedelta(seconds=settings.TASK_RETENTION)
+    deleted, _ = Task.objects.filter(status=Task.DONE,
+                                     finished_at__lt=deadline).delete()
+    return deleted
@@ -0,0 +1,144 @@
+import math
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+RATE_KEY = 'posts:rate:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+Usage = namedtuple('Usage', 'allowed limit remaining reset')
+
+
+def parse_rate(rate):
+    """'30/h' -> (30, 3600)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def client_ip(request):
+    """IP-адрес клиента.
+
+    За TRUSTED_PROXY_COUNT доверенными прокси это адрес, который
+    дописала в X-Forwarded-For самая внешняя из них: более ранние
+    адреса заголовка клиент может подделать.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        forwarded = [address.strip() for address in request.META.get(
+            'HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _incr(key, delta, timeout):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if delta > 0 and cache.add(key, delta, timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+class Bucket:
+    """Скользящее окно одного бюджета, например comment:user:<id>.
+
+    Попадания считаются атомарным cache.incr в окнах фиксированной
+    длины, а текущая нагрузка — это счётчик текущего окна плюс доля
+    предыдущего, ещё не вышедшая за скользящую границу. Так лимит не
+    удваивается на стыке окон, а в кэше на ключ хранятся два числа.
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.limit, self.period = parse_rate(rate)
+
+    def _key(self, window):
+        return RATE_KEY.format(self.name, window)
+
+    def hit(self, now):
+        window, offset = divmod(now, self.period)
+        window = int(window)
+        self.current = self._key(window)
+        count = _incr(self.current, 1, self.period * 2)
+        previous = cache.get(self._key(window - 1), 0)
+        used = previous * (1 - offset / self.period) + count
+        return Usage(
+            allowed=used <= self.limit,
+            limit=self.limit,
+            remaining=max(int(self.limit - used), 0),
+            reset=math.ceil(self.period - offset),
+        )
+
+    def undo(self):
+        """Не засчитывать отклонённый запрос."""
+        _incr(self.current, -1, self.period * 2)
+
+
+def buckets(request, scope):
+    """Бюджеты запроса в области scope: на пользователя, если он
+    вошёл, и на IP-адрес."""
+    rates = settings.RATE_LIMITS[scope]
+    result = []
+    user = getattr(request, 'user', None)
+    if 'user' in rates and user is not None and user.is_authenticated:
+        result.append(Bucket(f'{scope}:user:{user.pk}', rates['user']))
+    if 'ip' in rates:
+        result.append(Bucket(f'{scope}:ip:{client_ip(request)}',
+                             rates['ip']))
+    return result
+
+
+def check(request, *scopes):
+    """Засчитать запрос во всех бюджетах областей scopes.
+
+    Возвращает Usage самого исчерпанного бюджета. Если хоть один
+    бюджет превышен, запрос не засчитывается ни в одном из них.
+    """
+    now = time.time()
+    hits = [(bucket, bucket.hit(now))
+            for scope in scopes for bucket in buckets(request, scope)]
+    if not hits:
+        return None
+    usage = min((usage for _, usage in hits),
+                key=lambda usage: (usage.allowed, usage.remaining))
+    if not usage.allowed:
+        for bucket, _ in hits:
+            bucket.undo()
+    return usage
+
+
+def add_headers(response, usage):
+    response['X-RateLimit-Limit'] = usage.limit
+    response['X-RateLimit-Remaining'] = usage.remaining
+    response['X-RateLimit-Reset'] = usage.reset
+    if not usage.allowed:
+        response['Retry-After'] = usage.reset
+    return response
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Ограничить частоту запросов к представлению бюджетами
+    settings.RATE_LIMITS[scope].
+
+    Считаются только запросы с методами methods (None — все). Сверх
+    лимита отдаётся 429; заголовки X-RateLimit-* и Retry-After по
+    request.rate_limit добавляет RateLimitHeadersMiddleware.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is not None and request.method not in methods:
+                return view(request, *args, **kwargs)
+            usage = check(request, scope)
+            request.rate_limit = usage
+            if usage is not None and not usage.allowed:
+                return render(request, 'misc/429.html',
+                              {'retry_after': usage.reset}, status=429)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
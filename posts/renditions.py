@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from . import timeline
+from .cache import bump_generation, purge_pages
+from .models import ImageBlob, Post
+from .storage import replace_file
+from .uploads import sanitize
+
+logger = logging.getLogger(__name__)
+
+# Карточка поста обрезается по центру до пропорций CARD_SIZE и
+# сохраняется в нескольких ширинах: браузер выбирает из srcset
+# ближайшую к ширине экрана с учётом плотности пикселей.
+CARD_SIZE = (960, 339)
+WIDTHS = (360, 540, 720, 960)
+
+# Форматы в порядке предпочтения: MIME-тип -> (формат Pillow,
+# расширение, параметры сохранения). JPEG нужен для старых браузеров.
+FORMATS = {
+    'image/avif': ('AVIF', 'avif', {'quality': 50}),
+    'image/webp': ('WEBP', 'webp', {'quality': 75, 'method': 4}),
+    'image/jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True,
+                                   'progressive': True}),
+}
+FALLBACK_TYPE = 'image/jpeg'
+
+# Миниатюра, которую до появления вариантов создавал в шаблоне
+# {% thumbnail %}: её показывают посты, варианты которых ещё не созданы.
+LEGACY_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+LEGACY_KEY = 'posts:legacy_thumbnail:{}'
+LEGACY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def available_formats():
+    """MIME-типы из FORMATS, которые умеет сохранять текущий Pillow."""
+    Image.init()
+    return [mime for mime, (name, _, _) in FORMATS.items()
+            if name in Image.SAVE]
+
+
+def render(image, width, mime):
+    """Карточка шириной width в формате mime, байтами."""
+    name, _, options = FORMATS[mime]
+    height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+    card = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    if name == 'JPEG' and card.mode != 'RGB':
+        card = card.convert('RGB')
+    output = BytesIO()
+    card.save(output, name, **options)
+    return output.getvalue()
+
+
+def build(data):
+    """Создать все варианты картинки data и вернуть описание для
+    шаблона: URL карточки и srcset для каждого формата.
+
+    Файлы кладутся в renditions/<хеш содержимого>/, поэтому одинаковые
+    картинки разных постов обрабатываются один раз. Каждый файл
+    появляется под своим именем только целиком, так что уже
+    существующий можно брать без проверки.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    with Image.open(BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert(
+                'RGBA' if 'transparency' in source.info else 'RGB')
+        urls = {}
+        for mime in available_formats():
+            extension = FORMATS[mime][1]
+            for width in WIDTHS:
+                name = f'renditions/{digest}/{width}.{extension}'
+                if not default_storage.exists(name):
+                    replace_file(default_storage, name,
+                                 ContentFile(render(source, width, mime)))
+                urls[mime, width] = default_storage.url(name)
+
+    def srcset(mime):
+        return ', '.join(f'{urls[mime, width]} {width}w' for width in WIDTHS)
+
+    return {
+        'card': urls[FALLBACK_TYPE, CARD_SIZE[0]],
+        'srcset': srcset(FALLBACK_TYPE),
+        'sources': [{'type': mime, 'srcset': srcset(mime)}
+                    for mime in available_formats() if mime != FALLBACK_TYPE],
+    }
+
+
+def generate(post_id):
+    """Перекодировать картинку поста без метаданных, сгенерировать её
+    варианты и сохранить их URL.
+
+    Файл перекодируется и его варианты создаются один раз, а затем
+    берутся из ImageBlob для всех постов с этой картинкой. URL
+    записываются, только если картинка не сменилась за время генерации,
+    после чего сбрасываются кэши страниц с этим постом.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    blob = ImageBlob.objects.filter(name=post.image.name).first()
+    if blob is not None and blob.renditions:
+        variants = blob.renditions
+    else:
+        variants = json.dumps(build(sanitize(post.image)))
+        ImageBlob.objects.filter(name=post.image.name).update(
+            renditions=variants)
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        renditions=variants)
+    if updated:
+        bump_generation('index', *timeline.author_scopes(post.author_id))
+        purge_pages(f'post:{post_id}')
+
+
+def legacy_thumbnail(image):
+    """URL миниатюры LEGACY_THUMBNAIL картинки image: из KV-хранилища
+    sorl, а если её там нет — созданной заново, как делал
+    {% thumbnail %}. None, если картинку не удалось прочитать."""
+    geometry, options = LEGACY_THUMBNAIL
+    try:
+        return get_thumbnail(image, geometry, **options).url
+    except Exception:
+        logger.exception('Не удалось получить миниатюру %s', image.name)
+        return None
+
+
+def legacy_key(image):
+    digest = hashlib.md5(image.name.encode()).hexdigest()
+    return LEGACY_KEY.format(digest)
+
+
+def prefetch(posts):
+    """Подготовить картинки страницы постов к выводу.
+
+    Посты с готовыми вариантами ничего не требуют. Для остальных URL
+    старых миниатюр sorl берутся из кэша одним get_many, а для промахов
+    находятся через get_thumbnail() и кэшируются. Найденные URL
+    передаются в шаблон через post.legacy_thumbnail.
+    """
+    pending = [post for post in posts if post.image and not post.renditions]
+    if not pending:
+        return
+    keys = {post.pk: legacy_key(post.image) for post in pending}
+    found = cache.get_many(list(keys.values()))
+    missing = {}
+    for post in pending:
+        key = keys[post.pk]
+        if key not in found:
+            found[key] = missing[key] = legacy_thumbnail(post.image)
+        post.legacy_thumbnail = found[key]
+    if missing:
+        cache.set_many(missing, LEGACY_CACHE_TIMEOUT)
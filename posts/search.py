@@ -0,0 +1,315 @@
+import base64
+import hashlib
+import json
+import re
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError, connection
+
+from .cache import bump_generation, get_generation
+from .models import Comment, Post
+from .pagination import POSTS_PER_PAGE, CursorPage
+from .stemmer import stem
+
+WORD = re.compile(r'\w+')
+SEARCH_SCOPE = 'search'
+SEARCH_KEY = 'posts:search:{}:{}'
+
+# Во сколько раз совпадение в тексте поста весомее совпадения
+# в комментариях к нему.
+TEXT_WEIGHT = 2.0
+COMMENTS_WEIGHT = 1.0
+
+
+def terms(text):
+    """Основы слов текста в порядке следования."""
+    return [stem(word) for word in WORD.findall(str(text))]
+
+
+class SQLiteIndex:
+    """Индекс в виртуальной таблице FTS5 posts_search.
+
+    В SQLite нет русского стеммера, поэтому в таблицу пишутся уже
+    приведённые к основам слова. Пост и каждый комментарий — отдельные
+    строки: текст поста в столбце text с rowid 2 * id, комментарий
+    в столбце comments с rowid 2 * id + 1, так что правка комментария
+    переписывает одну строку, а не весь пост.
+    """
+
+    def update_post(self, cursor, post_id, text):
+        self._replace(cursor, 2 * post_id, post_id, text, '')
+
+    def update_comment(self, cursor, comment_id, post_id, text):
+        self._replace(cursor, 2 * comment_id + 1, post_id, '', text)
+
+    def delete_post(self, cursor, post_id):
+        cursor.execute('DELETE FROM posts_search WHERE rowid = %s',
+                       [2 * post_id])
+
+    def delete_comment(self, cursor, comment_id):
+        cursor.execute('DELETE FROM posts_search WHERE rowid = %s',
+                       [2 * comment_id + 1])
+
+    def _replace(self, cursor, rowid, post_id, text, comments):
+        cursor.execute('DELETE FROM posts_search WHERE rowid = %s', [rowid])
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, post_id, text, comments) '
+            'VALUES (%s, %s, %s, %s)',
+            [rowid, post_id, ' '.join(terms(text)),
+             ' '.join(terms(comments))])
+
+    def clear(self, cursor):
+        cursor.execute('DELETE FROM posts_search')
+
+    def matches(self, query):
+        words = dict.fromkeys(terms(query))
+        if not words:
+            return None
+        # Слова в кавычках ищутся все сразу и не разбираются как
+        # операторы FTS5.
+        match = ' '.join(f'"{word}"' for word in words)
+        # Пост находится по лучшей из своих строк. bm25() нельзя
+        # вызывать внутри агрегата, а LIMIT не даёт SQLite подставить
+        # подзапрос во внешний запрос.
+        return (
+            'SELECT post_id, MIN(score) AS score FROM ('
+            'SELECT post_id, bm25(posts_search, 0, %s, %s) AS score '
+            'FROM posts_search WHERE posts_search MATCH %s LIMIT -1'
+            ') AS documents GROUP BY post_id',
+            [TEXT_WEIGHT, COMMENTS_WEIGHT, match],
+        )
+
+
+class PostgreSQLIndex:
+    """Индекс в таблицах posts_search и comments_search со столбцом
+    tsvector.
+
+    Слова приводятся к основам русским словарём PostgreSQL, а текст
+    поста получает вес A, комментарий — вес B. У каждого комментария
+    своя строка.
+    """
+
+    def update_post(self, cursor, post_id, text):
+        cursor.execute(
+            'INSERT INTO posts_search (post_id, document) VALUES (%s, '
+            "setweight(to_tsvector('russian', %s), 'A')) "
+            'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+            [post_id, text])
+
+    def update_comment(self, cursor, comment_id, post_id, text):
+        cursor.execute(
+            'INSERT INTO comments_search (comment_id, post_id, document) '
+            "VALUES (%s, %s, setweight(to_tsvector('russian', %s), 'B')) "
+            'ON CONFLICT (comment_id) DO UPDATE '
+            'SET document = EXCLUDED.document',
+            [comment_id, post_id, text])
+
+    def delete_post(self, cursor, post_id):
+        cursor.execute('DELETE FROM posts_search WHERE post_id = %s',
+                       [post_id])
+
+    def delete_comment(self, cursor, comment_id):
+        cursor.execute('DELETE FROM comments_search WHERE comment_id = %s',
+                       [comment_id])
+
+    def clear(self, cursor):
+        cursor.execute('TRUNCATE posts_search, comments_search')
+
+    def matches(self, query):
+        if not WORD.search(query):
+            return None
+        weights = [0.1, 0.2, COMMENTS_WEIGHT / TEXT_WEIGHT, 1.0]
+        documents = (
+            'SELECT post_id, -ts_rank(%s::real[], document, query) '
+            'AS score FROM {}, '
+            "plainto_tsquery('russian', %s) AS query "
+            'WHERE document @@ query'
+        )
+        return (
+            'SELECT post_id, MIN(score) AS score FROM ('
+            + documents.format('posts_search') + ' UNION ALL '
+            + documents.format('comments_search')
+            + ') AS documents GROUP BY post_id',
+            [weights, query, weights, query],
+        )
+
+
+INDEXES = {
+    'sqlite': SQLiteIndex,
+    'postgresql': PostgreSQLIndex,
+}
+
+
+def get_index():
+    try:
+        return INDEXES[connection.vendor]()
+    except KeyError:
+        raise NotSupportedError(
+            f'Полнотекстовый поиск не поддерживается для {connection.vendor}')
+
+
+def index_post(post_id):
+    """Обновить строку индекса с текстом поста; если поста уже нет,
+    удалить её."""
+    text = (Post.objects.filter(pk=post_id)
+            .values_list('text', flat=True).first())
+    if text is None:
+        remove_post(post_id)
+        return
+    with connection.cursor() as cursor:
+        get_index().update_post(cursor, post_id, text)
+    bump_generation(SEARCH_SCOPE)
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        get_index().delete_post(cursor, post_id)
+    bump_generation(SEARCH_SCOPE)
+
+
+def index_comment(comment_id):
+    """Обновить строку индекса с текстом комментария; если его уже
+    нет, удалить её."""
+    comment = (Comment.objects.filter(pk=comment_id)
+               .values_list('post_id', 'text').first())
+    if comment is None:
+        remove_comment(comment_id)
+        return
+    with connection.cursor() as cursor:
+        get_index().update_comment(cursor, comment_id, *comment)
+    bump_generation(SEARCH_SCOPE)
+
+
+def remove_comment(comment_id):
+    with connection.cursor() as cursor:
+        get_index().delete_comment(cursor, comment_id)
+    bump_generation(SEARCH_SCOPE)
+
+
+def _batches(queryset, batch_size):
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_id).order_by('pk')
+                     [:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        yield batch
+
+
+def rebuild(batch_size=1000):
+    """Построить индекс заново по всем постам и комментариям; вернуть
+    число постов."""
+    index = get_index()
+    count = 0
+    with connection.cursor() as cursor:
+        index.clear(cursor)
+        for batch in _batches(Post.objects.values_list('pk', 'text'),
+                              batch_size):
+            for post_id, text in batch:
+                index.update_post(cursor, post_id, text)
+            count += len(batch)
+        for batch in _batches(
+                Comment.objects.values_list('pk', 'post_id', 'text'),
+                batch_size):
+            for comment_id, post_id, text in batch:
+                index.update_comment(cursor, comment_id, post_id, text)
+    bump_generation(SEARCH_SCOPE)
+    return count
+
+
+def filter_posts(queryset, query):
+    """Оставить в queryset посты, подходящие под запрос, не меняя
+    его порядок."""
+    matches = get_index().matches(query)
+    if matches is None:
+        return queryset.none()
+    sql, params = matches
+    # Не pk__in=RawSQL(...): SQLite читает «IN ((SELECT ...))» как
+    # список из одного значения.
+    column = '{}.{}'.format(connection.ops.quote_name(Post._meta.db_table),
+                            connection.ops.quote_name(Post._meta.pk.column))
+    return queryset.extra(
+        where=[f'{column} IN (SELECT post_id FROM ({sql}) AS matches)'],
+        params=params)
+
+
+def encode_cursor(score, post_id):
+    data = json.dumps([score, post_id]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        data = base64.urlsafe_b64decode(cursor + padding)
+        score, post_id = json.loads(data)
+        return float(score), int(post_id)
+    except Exception:
+        return None
+
+
+def _ranked(matches, position, limit):
+    """До limit пар (релевантность, id поста) после позиции position
+    в порядке убывания релевантности."""
+    sql, params = matches
+    # Копия: matches используется повторно, если страница выходит за
+    # закэшированные результаты.
+    params = list(params)
+    sql = f'SELECT score, post_id FROM ({sql}) AS matches'
+    if position is not None:
+        score, post_id = position
+        sql += ' WHERE score > %s OR (score = %s AND post_id > %s)'
+        params += [score, score, post_id]
+    sql += ' ORDER BY score, post_id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def ranked(query, matches, position, limit):
+    """Как _ranked(), но первые SEARCH_CACHE_RESULTS результатов
+    запроса берутся из кэша.
+
+    Частые слова совпадают с большой долей постов, и их ранжирование
+    дорого, а листают обычно первые страницы. Кэш сбрасывается при
+    любом изменении индекса и по SEARCH_CACHE_TIMEOUT.
+    """
+    digest = hashlib.sha256(query.encode()).hexdigest()
+    key = SEARCH_KEY.format(digest, get_generation(SEARCH_SCOPE))
+    top = cache.get(key)
+    if top is None:
+        top = _ranked(matches, None, settings.SEARCH_CACHE_RESULTS)
+        cache.set(key, top, settings.SEARCH_CACHE_TIMEOUT)
+    start = 0 if position is None else bisect_right(top, position)
+    rows = top[start:start + limit]
+    if len(rows) < limit and len(top) >= settings.SEARCH_CACHE_RESULTS:
+        # Страница выходит за закэшированные результаты.
+        return _ranked(matches, position, limit)
+    return rows
+
+
+def find_posts(query, cursor=None, per_page=POSTS_PER_PAGE):
+    """Страница постов, подходящих под запрос, от самых релевантных.
+
+    Страницы листаются курсором по паре (релевантность, id), как
+    ленты в CursorPaginator: OFFSET по результатам поиска не нужен.
+    """
+    matches = get_index().matches(query)
+    if matches is None:
+        return CursorPage([], None)
+    position = decode_cursor(cursor) if cursor else None
+    rows = ranked(query, matches, position, per_page + 1)
+
+    posts = Post.objects.feed().in_bulk([post_id for _, post_id in rows])
+    # Строки индекса без поста (например, после flush) пропускаются.
+    rows = [(score, post_id) for score, post_id in rows if post_id in posts]
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*rows[-1])
+    return CursorPage([posts[post_id] for _, post_id in rows], None,
+                      next_cursor)
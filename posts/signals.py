@@ -0,0 +1,243 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, tasks
+from .cache import bump_generation, purge_pages
+from .models import Comment, Follow, Group, Post, Profile, User
+from .pagination import invalidate_counts
+
+# Поля, которые показываются в карточках постов.
+NAME_FIELDS = {'username', 'title', 'slug'}
+AUTHOR_FIELDS = {'author', 'author_id'}
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_counts_changed(sender, instance, **kwargs):
+    scopes = ['index', f'author:{instance.author_id}']
+    if instance.group_id is not None:
+        scopes.append(f'group:{instance.group_id}')
+    previous = getattr(instance, 'previous_author_id', None)
+    if previous is not None and previous != instance.author_id:
+        scopes.append(f'author:{previous}')
+    invalidate_counts(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_counts_changed(sender, instance, **kwargs):
+    invalidate_counts(f'follow:{instance.user_id}', 'follows')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_counts_changed(sender, instance, **kwargs):
+    # Комментарии не меняют число постов в лентах.
+    invalidate_counts('comments')
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def count_posts(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if kwargs['signal'] is post_save and not created:
+        previous = getattr(instance, 'previous_author_id', None)
+        if previous is not None and previous != instance.author_id:
+            # Пост может переходить между авторами сколько угодно раз,
+            # поэтому у этих задач нет ключа.
+            tasks.count_post.delay(previous, -1)
+            tasks.count_post.delay(instance.author_id, 1)
+        return
+    delta = 1 if created else -1
+    tasks.count_post.delay(instance.author_id, delta,
+                           key=f'count_post:{instance.pk}:{delta}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comments(sender, instance, created=False, raw=False, **kwargs):
+    if raw or (kwargs['signal'] is post_save and not created):
+        return
+    if instance.post_id is not None:
+        delta = 1 if created else -1
+        tasks.count_comment.delay(instance.post_id, delta,
+                                  key=f'count_comment:{instance.pk}:{delta}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_follows(sender, instance, created=False, raw=False, **kwargs):
+    if raw or (kwargs['signal'] is post_save and not created):
+        return
+    delta = 1 if created else -1
+    tasks.count_follow.delay(instance.user_id, instance.author_id, delta,
+                             key=f'count_follow:{instance.pk}:{delta}')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.fan_out.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.backfill_timeline.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    tasks.prune_timeline.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = ['posts', f'post:{instance.pk}', f'author:{instance.author_id}']
+    previous = getattr(instance, 'previous_author_id', None)
+    if previous is not None and previous != instance.author_id:
+        keys.append(f'author:{previous}')
+    if instance.group_id is not None:
+        keys.append(f'group:{instance.group_id}')
+    tasks.post_changed.delay(instance.author_id, keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.post_id is not None:
+        tasks.comment_changed.delay(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.follow_changed.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge_pages(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+def names_changed(sender, instance, created=False, raw=False,
+                  update_fields=None, **kwargs):
+    """Сбросить фрагменты лент и страницы с карточками постов: в них
+    показаны имена авторов и названия групп."""
+    if raw or created or (update_fields is not None
+                          and not NAME_FIELDS.intersection(update_fields)):
+        return
+    bump_generation('names')
+    if sender is Group:
+        purge_pages(f'group_name:{instance.pk}')
+    else:
+        purge_pages(f'user_name:{instance.pk}', f'author:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    """Запомнить прежние картинку и автора поста и сбросить варианты,
+    если картинка сменилась: так это работает для форм, админки, API
+    и любых других вызовов save()."""
+    instance.previous_image = None
+    instance.previous_author_id = None
+    instance.image_changed = False
+    instance.image_uploaded = False
+    if raw:
+        return
+    saves_image = update_fields is None or 'image' in update_fields
+    saves_author = (update_fields is None
+                    or not AUTHOR_FIELDS.isdisjoint(update_fields))
+    if not saves_image and not saves_author:
+        return
+    if instance.pk is not None:
+        previous = (Post.objects.filter(pk=instance.pk)
+                    .values_list('image', 'author_id').first())
+        if previous is not None:
+            if saves_image:
+                instance.previous_image = previous[0]
+            if saves_author:
+                instance.previous_author_id = previous[1]
+    if saves_image:
+        # Загрузка из формы, админки или API записывается в хранилище
+        # уже после этого сигнала и удерживается там через hold().
+        instance.image_uploaded = (bool(instance.image)
+                                   and not instance.image._committed)
+        instance.image_changed = ((instance.previous_image or '')
+                                  != (instance.image.name or ''))
+        if instance.image_changed:
+            instance.renditions = ''
+
+
+@receiver(post_save, sender=Post)
+def generate_renditions(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    if raw or not getattr(instance, 'image_changed', False):
+        return
+    if update_fields is not None and 'renditions' not in update_fields:
+        Post.objects.filter(pk=instance.pk).update(renditions='')
+    if instance.image:
+        tasks.generate_renditions.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    if created:
+        blobs.acquire(image)
+        return
+    previous = getattr(instance, 'previous_image', None)
+    # Повторная загрузка тех же байтов даёт прежнее имя, но удержание
+    # загрузки нужно снять: acquire() и release() вместе только его и
+    # снимают.
+    uploaded = getattr(instance, 'image_uploaded', False)
+    if previous is not None and (previous != image or uploaded):
+        blobs.acquire(image)
+        blobs.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    blobs.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and (update_fields is None or 'text' in update_fields):
+        tasks.index_post.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    tasks.unindex_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    if not raw and (update_fields is None or 'text' in update_fields):
+        tasks.index_comment.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    tasks.unindex_comment.delay(instance.pk)
@@ -0,0 +1,73 @@
+"""Стеммер русского языка по алгоритму Snowball (Портера).
+
+Окончания ищутся только в области RV — части слова после первой
+гласной, поэтому короткие слова почти не меняются. Из нескольких
+подходящих окончаний группы отрезается самое длинное: регулярные
+выражения ниже привязаны к концу строки, и re.sub находит самое
+левое, то есть самое длинное, совпадение.
+"""
+import re
+from functools import lru_cache
+
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ья|я)$')
+FINAL_I = re.compile(r'и$')
+# Словообразовательное окончание отрезается только в области R2:
+# перед ним должны быть гласная, затем согласная.
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_ENDING = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+DOUBLE_N = re.compile(r'нн$')
+SOFT_SIGN = re.compile(r'ь$')
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа слова word в нижнем регистре; ё заменяется на е."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное,
+    # причастие, глагол или существительное.
+    shortened = PERFECTIVE_GERUND.sub('', rv, 1)
+    if shortened == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        shortened = ADJECTIVE.sub('', rv, 1)
+        if shortened != rv:
+            rv = PARTICIPLE.sub('', shortened, 1)
+        else:
+            shortened = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if shortened == rv else shortened
+    else:
+        rv = shortened
+
+    # Шаги 2 и 3: конечная «и» и словообразовательное окончание.
+    rv = FINAL_I.sub('', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_ENDING.sub('', rv, 1)
+
+    # Шаг 4: «нн» в «н», превосходная степень или мягкий знак.
+    shortened = DOUBLE_N.sub('н', rv, 1)
+    if shortened == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = DOUBLE_N.sub('н', rv, 1)
+        rv = SOFT_SIGN.sub('', rv, 1)
+    else:
+        rv = shortened
+    return start + rv
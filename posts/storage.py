@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def write_temporary(directory, content):
+    """Записать content во временный файл в каталоге directory;
+    вернуть путь к нему и SHA-256 содержимого."""
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                file.write(chunk)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return temporary, digest.hexdigest()
+
+
+def replace_file(storage, name, content):
+    """Записать content в файл name файлового хранилища storage.
+
+    Файл пишется рядом под временным именем и переименовывается
+    поверх прежнего, поэтому читатели и проверка exists() не увидят
+    недописанный файл, даже если запись оборвётся.
+    """
+    path = storage.path(name)
+    temporary, _ = write_temporary(os.path.dirname(path), content)
+    try:
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    if storage.file_permissions_mode is not None:
+        os.chmod(path, storage.file_permissions_mode)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла — SHA-256 загруженного содержимого.
+
+    Файл posts/photo.jpg сохраняется как posts/ab/cd/<sha256>.jpg:
+    хеш считается по ходу записи во временный файл, после чего тот
+    переименовывается в итоговое имя. Если такой файл уже есть,
+    повторная загрузка не занимает места на диске и получает то же имя.
+    Загрузка удерживает файл через posts.blobs.hold(), пока его пост
+    не сохранён.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя зависит от содержимого и вычисляется в _save.
+        return name
+
+    @staticmethod
+    def content_name(name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4],
+                            digest + extension)
+
+    def replace(self, name, content):
+        """Заменить содержимое файла name, сохранив имя. Так воркер
+        перекодирует загруженные картинки: имя остаётся хешем
+        загруженного содержимого, и повторная загрузка того же файла
+        получит уже перекодированный."""
+        replace_file(self, name, content)
+
+    def _save(self, name, content):
+        temporary, digest = write_temporary(
+            self.path(os.path.dirname(name)), content)
+        try:
+            name = self.content_name(name, digest).replace('\\', '/')
+            path = self.path(name)
+            # Импорт здесь: модели сами ссылаются на это хранилище.
+            from .blobs import hold
+            hold(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+                # Сборщик мусора не трогает недавно изменённые файлы.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
@@ -0,0 +1,113 @@
+"""Побочные эффекты записи постов, комментариев и подписок.
+
+Сигналы ставят эти задачи в очередь posts.queue, и запрос не ждёт
+миниатюр, индексации, раскладки по лентам, пересчёта счётчиков и
+сброса кэшей. Задачи получают id, а не объекты: к моменту выполнения
+объекта может уже не быть.
+"""
+from django.db import transaction
+
+from . import renditions, search, timeline
+from .cache import bump_generation, purge_pages
+from .counters import adjust_post, adjust_profile
+from .models import Follow, Post
+from .queue import task
+
+
+@task
+def generate_renditions(post_id):
+    renditions.generate(post_id)
+
+
+# Правки подряд сливаются в одну переиндексацию.
+@task(coalesce=True)
+def index_post(post_id):
+    search.index_post(post_id)
+
+
+@task
+def unindex_post(post_id):
+    search.remove_post(post_id)
+
+
+@task(coalesce=True)
+def index_comment(comment_id):
+    search.index_comment(comment_id)
+
+
+@task
+def unindex_comment(comment_id):
+    search.remove_comment(comment_id)
+
+
+@task
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task
+def backfill_timeline(user_id, author_id):
+    # Подписку могли отменить, пока задача ждала своей очереди.
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+
+
+@task
+def prune_timeline(user_id, author_id):
+    # На автора могли подписаться снова, пока задача ждала очереди.
+    if not Follow.objects.filter(user_id=user_id,
+                                 author_id=author_id).exists():
+        timeline.prune(user_id, author_id)
+
+
+# Счётчики меняются приращениями, поэтому эти задачи ставятся
+# с ключами, и повторная постановка не посчитает событие дважды.
+
+@task
+def count_post(author_id, delta):
+    adjust_profile(author_id, posts_count=delta)
+
+
+@task
+def count_comment(post_id, delta):
+    adjust_post(post_id, delta)
+
+
+@task
+def count_follow(user_id, author_id, delta):
+    with transaction.atomic():
+        adjust_profile(author_id, followers_count=delta)
+        adjust_profile(user_id, following_count=delta)
+        if delta < 0 and timeline.left_popular(author_id, delta):
+            refill_timelines.delay(author_id)
+
+
+@task
+def refill_timelines(author_id):
+    timeline.refill(author_id)
+    bump_generation(*timeline.author_scopes(author_id))
+
+
+@task
+def post_changed(author_id, pages):
+    bump_generation('index', *timeline.author_scopes(author_id))
+    purge_pages(*pages)
+
+
+@task
+def comment_changed(post_id):
+    author_id = (Post.objects.filter(pk=post_id)
+                 .values_list('author_id', flat=True).first())
+    scopes = ['index']
+    if author_id is not None:
+        scopes += timeline.author_scopes(author_id)
+    bump_generation(*scopes)
+    purge_pages(f'post:{post_id}')
+
+
+@task
+def follow_changed(user_id, author_id):
+    bump_generation(f'follow:{user_id}')
+    purge_pages(f'author:{author_id}', f'author:{user_id}')
@@ -0,0 +1,31 @@
+from django import template
+
+from posts import renditions
+
+register = template.Library()
+
+# Карточка занимает всю ширину колонки, но не больше 960px.
+CARD_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post):
+    """Картинка поста в <picture> с вариантами разных ширин и форматов.
+
+    Пока варианты не созданы, показывается старая миниатюра sorl,
+    если она есть, но не исходный файл: до перекодирования воркером
+    в нём остаются метаданные.
+    """
+    return {
+        'post': post,
+        'renditions': post.rendition_urls,
+        'sizes': CARD_SIZES,
+    }
+
+
+@register.simple_tag
+def prefetch_post_images(posts):
+    """Подготовить картинки всех постов страницы одним пакетом до того,
+    как их покажет {% post_image %}."""
+    renditions.prefetch(posts)
+    return ''
@@ -0,0 +1,21 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page, size=2):
+    """Номера страниц вокруг текущей плюс первая и последняя.
+
+    Пропуски обозначаются None, поэтому ссылок в навигации всегда
+    не больше 2 * size + 5, сколько бы страниц ни было в ленте.
+    """
+    last = page.paginator.num_pages
+    start = max(page.number - size, 1)
+    end = min(page.number + size, last)
+    pages = list(range(start, end + 1))
+    if start > 1:
+        pages = [1] + ([None] if start > 2 else []) + pages
+    if end < last:
+        pages += ([None] if end < last - 1 else []) + [last]
+    return pages
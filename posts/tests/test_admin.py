@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [User.objects.create(username=f'author_{index}')
+                       for index in range(5)]
+        for index, author in enumerate(cls.authors):
+            post = Post.objects.create(text=f'Пост про море {index}',
+                                       author=author, group=cls.group)
+            Comment.objects.create(post=post, author=author,
+                                   text=f'Комментарий {index}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        """Число запросов списка не растёт с числом строк, а повторный
+        показ не считает COUNT(*) заново"""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                first = self.changelist_queries(model)
+                author = User.objects.create(username=f'more_{model}')
+                post = Post.objects.create(text='Ещё пост', author=author,
+                                           group=self.group)
+                Comment.objects.create(post=post, author=author,
+                                       text='Ещё комментарий')
+                cache.clear()
+                self.assertEqual(self.changelist_queries(model), first)
+                self.assertEqual(self.changelist_queries(model), first - 1)
+
+    def test_comment_count_is_reset_by_writes(self):
+        """Новый и удалённый комментарий сразу меняют число строк
+        в списке комментариев"""
+        url = reverse('admin:posts_comment_changelist')
+        self.assertEqual(self.client.get(url).context['cl'].result_count,
+                         len(self.authors))
+        comment = Comment.objects.create(post=Post.objects.first(),
+                                         author=self.admin, text='Новый')
+        self.assertEqual(self.client.get(url).context['cl'].result_count,
+                         len(self.authors) + 1)
+        comment.delete()
+        self.assertEqual(self.client.get(url).context['cl'].result_count,
+                         len(self.authors))
+
+    def test_profile_counters_are_read_only(self):
+        """Счётчики профиля видны в админке, но не редактируются"""
+        profile = self.authors[0].profile
+        url = reverse('admin:posts_profile_change', args=(profile.pk,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        form = response.context['adminform'].form
+        self.assertNotIn('posts_count', form.fields)
+        self.client.post(url, {'user': profile.user_id, 'posts_count': 100})
+        profile.refresh_from_db()
+        self.assertEqual(profile.posts_count, 1)
+
+    def test_search_uses_index(self):
+        """Поиск в списке постов находит формы слов через индекс"""
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'морем'})
+        self.assertEqual(len(response.context['cl'].result_list),
+                         len(self.authors))
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'горы'})
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+    def test_change_form_does_not_list_users(self):
+        """Форма поста не загружает всех пользователей в <select>"""
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,)))
+        self.assertEqual(response.status_code, 200)
+        other = next(author for author in self.authors
+                     if author != post.author)
+        self.assertNotContains(response, other.username)
+        self.assertContains(response, 'admin-autocomplete')
@@ -1,12 +1,20 @@
+import os
 import shutil
+import struct
 import tempfile
+import zlib
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.http import HttpRequest
 from django.test import Client, TestCase
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Group, Post, User
+from posts.uploads import HEADER_LIMIT, ImageUploadHandler
 
 
 class PostFormTests(TestCase):
@@ -90,3 +98,100 @@ class PostFormTests(TestCase):
                                                'post_id': self.post.id}))
         self.assertEqual(self.post.text, form_data['text'])
         self.assertEqual(Post.objects.count(), posts_count)
+
+
+class ImageUploadTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+        cls.user = User.objects.create(username='Тестовый автор')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def image_file(size, image_format='PNG', noise=False, **options):
+        if noise:
+            image = Image.frombytes('RGB', size, os.urandom(
+                size[0] * size[1] * 3))
+        else:
+            image = Image.new('RGB', size, (200, 0, 0))
+        file = BytesIO()
+        image.save(file, image_format, **options)
+        return file.getvalue()
+
+    def post_image(self, content, name='image.png'):
+        return self.authorized_client.post(reverse('new_post'), data={
+            'text': 'Тестовый текст',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def test_invalid_uploads_are_rejected(self):
+        """Слишком большие файлы и картинки и не картинки отклоняются
+        с ошибкой формы"""
+        uploads = {
+            'Размер файла не должен превышать': self.image_file(
+                (500, 500), noise=True),
+            'Картинка не должна быть больше': self.image_file((2000, 2000)),
+            'Загрузите правильное изображение': os.urandom(
+                HEADER_LIMIT + 1024),
+        }
+        for error, content in uploads.items():
+            with self.subTest(error=error):
+                with self.settings(MAX_IMAGE_UPLOAD_SIZE=HEADER_LIMIT * 2,
+                                   MAX_IMAGE_PIXELS=1000 * 1000):
+                    response = self.post_image(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(error,
+                              response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_rejects_before_reading_whole_file(self):
+        """Обработчик отклоняет картинку по первому фрагменту файла"""
+        request = HttpRequest()
+        handler = ImageUploadHandler(request)
+        # Начало PNG размером 100000x100000: заголовок и первый
+        # фрагмент данных изображения.
+        ihdr = b'IHDR' + struct.pack('>IIBBBBB', 100000, 100000, 8, 2,
+                                     0, 0, 0)
+        header = (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + ihdr
+                  + struct.pack('>I', zlib.crc32(ihdr))
+                  + struct.pack('>I', 65536) + b'IDAT' + bytes(1024))
+        handler.new_file('image', 'image.png', 'image/png')
+        with self.assertRaises(StopUpload) as stop:
+            handler.receive_data_chunk(header, 0)
+        self.assertTrue(stop.exception.connection_reset)
+        self.assertIn('image', request.upload_errors)
+
+    def test_oversized_request_is_rejected_before_reading(self):
+        """Запрос больше допустимого по Content-Length отклоняется
+        с кодом 413, не доходя до формы"""
+        content = self.image_file((500, 500), noise=True)
+        with self.settings(MAX_IMAGE_UPLOAD_SIZE=HEADER_LIMIT,
+                           DATA_UPLOAD_MAX_MEMORY_SIZE=HEADER_LIMIT):
+            response = self.post_image(content)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Post.objects.exists())
+
+    def test_uploaded_image_is_reencoded_without_exif(self):
+        """Загруженная картинка поворачивается по EXIF и сохраняется
+        без метаданных"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Тестовая камера'
+        self.post_image(self.image_file((40, 20), 'JPEG', exif=exif),
+                        name='photo.jpg')
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertEqual(len(image.getexif()), 0)
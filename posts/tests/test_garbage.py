@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+
+from posts import renditions
+from posts.models import Post, User
+from posts.tests.test_renditions import uploaded_image
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CollectGarbageTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.author = User.objects.create(username='Тестовый автор')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.post = self.create_post('Тестовый текст', (200, 0, 0))
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={
+                'username': self.author.username,
+                'post_id': self.post.pk,
+            }),
+            data={'text': 'Новый текст',
+                  'image': uploaded_image(color=(0, 200, 0))},
+        )
+        self.post.refresh_from_db()
+        # Картинка, загруженная запросом, который упал до сохранения поста.
+        storage = self.post.image.storage
+        self.orphan = storage.save('posts/orphan.png', ContentFile(b'orphan'))
+        card = self.post.rendition_urls['card'][len(settings.MEDIA_URL):]
+        self.current_files = {self.post.image.name} | {
+            name for name in self.files()
+            if name.startswith(os.path.dirname(card))
+        }
+        self.old_files = self.files() - self.current_files
+
+    def create_post(self, text, color):
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': text,
+            'image': uploaded_image(color=color),
+        })
+        return Post.objects.get(text=text)
+
+    @staticmethod
+    def files():
+        return {
+            os.path.relpath(os.path.join(path, name), MEDIA_ROOT)
+            for path, _, names in os.walk(MEDIA_ROOT) for name in names
+        }
+
+    def collect(self, *args):
+        output = StringIO()
+        call_command('collect_garbage', '--min-age=0', *args, stdout=output)
+        return output.getvalue()
+
+    def test_replaced_image_is_removed(self):
+        """Заменённая картинка и её варианты удаляются, текущие
+        остаются, а в отчёте есть освобождённый объём"""
+        size = sum(os.path.getsize(os.path.join(MEDIA_ROOT, name))
+                   for name in self.old_files)
+        self.assertTrue(any(name.startswith('renditions/')
+                            for name in self.old_files))
+        output = self.collect()
+        self.assertEqual(self.files(), self.current_files)
+        self.assertIn(f'({size} байт) в {len(self.old_files)} файлах',
+                      output)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, self.post.rendition_urls['card'])
+
+    def test_deleted_post_files_are_removed(self):
+        """Картинка удалённого поста удаляется, если она не нужна
+        другим постам"""
+        other = self.create_post('Второй пост', (0, 200, 0))
+        self.post.delete()
+        self.collect()
+        self.assertEqual(self.files(), self.current_files)
+        self.assertTrue(other.image.storage.exists(other.image.name))
+
+    def test_dry_run_keeps_files(self):
+        """С --dry-run файлы только подсчитываются"""
+        output = self.collect('--dry-run')
+        self.assertIn('можно удалить', output)
+        self.assertEqual(self.files(), self.old_files | self.current_files)
+
+    def test_fresh_files_are_kept(self):
+        """Недавно созданные файлы не удаляются: их пост может быть
+        ещё не сохранён"""
+        call_command('collect_garbage', stdout=StringIO())
+        self.assertEqual(self.files(), self.old_files | self.current_files)
+
+    def test_collection_resumes_from_checkpoint(self):
+        """Обход продолжается с контрольной точки и удаляет её в конце"""
+        checkpoint = os.path.join(MEDIA_ROOT, '.collect_garbage.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'posts': 'posts/~'}, file)
+        self.collect()
+        remaining = self.files() - self.current_files
+        self.assertEqual(remaining, {self.orphan})
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_finished_roots_are_skipped(self):
+        """Каталоги, пройденные до прерывания, не обходятся заново,
+        а остальные продолжаются каждый со своей точки"""
+        checkpoint = os.path.join(MEDIA_ROOT, '.collect_garbage.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'posts': None, 'renditions': 'renditions/~'}, file)
+        self.collect()
+        self.assertEqual(self.files(),
+                         self.old_files | self.current_files)
+
+    def test_references_are_checked_in_batches(self):
+        """Используемые файлы проверяются в базе пачками"""
+        with self.assertNumQueries(5):
+            self.collect('--dry-run', '--batch-size=100')
+        # Ссылки на варианты и миниатюры собираются заранее, а картинки
+        # постов проверяются по одной.
+        images = len([name for name in self.old_files | self.current_files
+                      if name.startswith('posts/')])
+        with self.assertNumQueries(3 + 2 * images):
+            self.collect('--dry-run', '--batch-size=1')
+
+    def test_unused_legacy_thumbnails_are_removed(self):
+        """Миниатюры sorl остаются только у постов без вариантов"""
+        legacy = get_thumbnail(self.post.image,
+                               renditions.LEGACY_THUMBNAIL[0],
+                               **renditions.LEGACY_THUMBNAIL[1])
+        other = self.create_post('Второй пост', (0, 0, 200))
+        Post.objects.filter(pk=other.pk).update(renditions='')
+        kept = get_thumbnail(other.image, renditions.LEGACY_THUMBNAIL[0],
+                             **renditions.LEGACY_THUMBNAIL[1])
+        self.collect()
+        self.assertFalse(legacy.storage.exists(legacy.name))
+        self.assertIsNone(default.kvstore.get(legacy))
+        self.assertTrue(kept.storage.exists(kept.name))
+        self.assertIsNotNone(default.kvstore.get(kept))
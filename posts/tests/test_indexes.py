@@ -0,0 +1,88 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# Таблицы, которые растут вместе с сайтом: читать их целиком
+# или сортировать во временном B-дереве нельзя.
+LARGE_TABLES = ('posts_post', 'posts_comment', 'posts_follow',
+                'posts_timelineentry')
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.reader = User.objects.create(username='Читатель')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for index in range(15):
+            cls.post = Post.objects.create(text=f'Тестовый текст {index}',
+                                           author=cls.author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text='Тестовый комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url):
+        """Планы всех SELECT по большим таблицам, выполненных при
+        запросе url."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(
+                        f'"{table}"' in sql for table in LARGE_TABLES):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def test_views_read_large_tables_by_index(self):
+        """Страницы читают посты, комментарии и подписки по индексам
+        и без сортировки во временных таблицах"""
+        pages = {
+            reverse('index'): 'post_pub_date_id_idx',
+            reverse('index') + '?cursor=': 'post_pub_date_id_idx',
+            reverse('group', kwargs={'slug': self.group.slug}):
+                'post_group_pub_date_idx',
+            reverse('group', kwargs={'slug': self.group.slug}) + '?page=2':
+                'post_group_pub_date_idx',
+            reverse('profile', kwargs={'username': self.author.username}):
+                'post_author_pub_date_idx',
+            reverse('post', kwargs={'username': self.author.username,
+                                    'post_id': self.post.pk}):
+                'comment_post_created_idx',
+            reverse('follow_index'): 'timeline_user_pub_date_idx',
+        }
+        for url, index in pages.items():
+            plans = self.plans(url)
+            with self.subTest(url=url):
+                self.assertTrue(any(index in line
+                                    for _, plan in plans for line in plan))
+            for sql, plan in plans:
+                for line in plan:
+                    with self.subTest(url=url, sql=sql, line=line):
+                        self.assertNotIn('TEMP B-TREE', line)
+                        match = FULL_SCAN.match(line)
+                        self.assertFalse(match and match.group(1)
+                                         in LARGE_TABLES)
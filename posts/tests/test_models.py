@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import Comment, Follow, Group, Post, Profile, User
 
 
 class AllModelTest(TestCase):
@@ -116,3 +120,87 @@ class AllModelTest(TestCase):
         group = AllModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора не сохраняется."""
+        follow = AllModelTest.follow
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=follow.user, author=follow.author)
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.reader = User.objects.create(username='Тестовый читатель')
+
+    def assertProfileCounts(self, user, **expected):
+        profile = Profile.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(profile, field), value)
+
+    def test_profile_is_created_with_user(self):
+        """Профиль со счётчиками создается вместе с пользователем"""
+        self.assertProfileCounts(self.author, posts_count=0,
+                                 followers_count=0, following_count=0)
+
+    def test_post_and_comment_counters(self):
+        """Создание и удаление постов и комментариев
+        меняет счётчики"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Тестовый комментарий')
+        self.assertProfileCounts(self.author, posts_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        post.delete()
+        self.assertProfileCounts(self.author, posts_count=0)
+
+    def test_post_moved_to_another_author(self):
+        """Смена автора поста переносит его в счётчике записей"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        post.author = self.reader
+        post.save()
+        self.assertProfileCounts(self.author, posts_count=0)
+        self.assertProfileCounts(self.reader, posts_count=1)
+        post.author = self.author
+        post.save(update_fields=['author'])
+        self.assertProfileCounts(self.author, posts_count=1)
+        self.assertProfileCounts(self.reader, posts_count=0)
+        post.save()
+        self.assertProfileCounts(self.author, posts_count=1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertProfileCounts(self.author, followers_count=1,
+                                 following_count=0)
+        self.assertProfileCounts(self.reader, followers_count=0,
+                                 following_count=1)
+        follow.delete()
+        self.assertProfileCounts(self.author, followers_count=0)
+        self.assertProfileCounts(self.reader, following_count=0)
+
+    def test_repair_counters_fixes_drift(self):
+        """Команда repair_counters исправляет расхождения счётчиков"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Comment.objects.create(post=post, author=self.reader,
+                               text='Тестовый комментарий')
+        Profile.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comment_count=0)
+        Profile.objects.filter(user=self.reader).delete()
+
+        call_command('repair_counters', stdout=StringIO())
+
+        self.assertProfileCounts(self.author, posts_count=1)
+        self.assertProfileCounts(self.reader, posts_count=0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
@@ -0,0 +1,196 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts import queue, tasks
+from posts.models import Comment, Follow, Post, Task, TimelineEntry, User
+from posts.queue import task
+
+CALLS = []
+
+
+@task
+def record(value):
+    CALLS.append(value)
+
+
+@task(coalesce=True)
+def merge(value):
+    CALLS.append(value)
+
+
+@task
+def record_savepoints():
+    CALLS.append(len(connection.savepoint_ids))
+
+
+@task(max_attempts=2)
+def fail(value):
+    CALLS.append(value)
+    raise ValueError(value)
+
+
+@override_settings(TASK_QUEUE='db', TASK_RETRY_DELAY=60)
+class QueueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Тестовый автор')
+
+    def setUp(self):
+        cache.clear()
+        CALLS.clear()
+
+    def test_task_runs_in_worker(self):
+        """Задача выполняется воркером, а не при постановке"""
+        record.delay('первый')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(queue.work(), 1)
+        self.assertEqual(CALLS, ['первый'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertEqual(queue.work(), 0)
+
+    def test_task_runs_outside_transaction_without_row_locks(self):
+        """Без SKIP LOCKED задача не выполняется внутри транзакции
+        воркера и не запирает SQLite на время работы"""
+        self.assertFalse(queue.row_locks())
+        record_savepoints.delay()
+        outside = len(connection.savepoint_ids)
+        queue.work()
+        self.assertEqual(CALLS, [outside])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_idempotency_key(self):
+        """Задача с уже известным ключом не ставится повторно"""
+        record.delay(1, key='record:1')
+        queue.work()
+        record.delay(1, key='record:1')
+        record.delay(2, key='record:2')
+        queue.work()
+        self.assertEqual(CALLS, [1, 2])
+
+    def test_coalesce_while_pending(self):
+        """Одинаковые задачи сливаются, пока ждут запуска, а после
+        запуска ставятся снова"""
+        merge.delay(1)
+        merge.delay(1)
+        merge.delay(2)
+        self.assertEqual(Task.objects.count(), 2)
+        claimed = queue.claim(10)
+        merge.delay(1)
+        self.assertEqual(Task.objects.count(), 3)
+        for queued in claimed:
+            queue.run(queued)
+        queue.work()
+        self.assertEqual(sorted(CALLS), [1, 1, 2])
+
+    def test_rolled_back_task_is_not_queued(self):
+        """Задача из откаченной транзакции не попадает в очередь"""
+        with transaction.atomic():
+            record.delay('откат')
+            transaction.set_rollback(True)
+        self.assertFalse(Task.objects.exists())
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется позже, а после max_attempts
+        помечается FAILED"""
+        fail.delay('ошибка')
+        queue.work()
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts),
+                         (Task.PENDING, 1))
+        self.assertIn('ValueError', queued.error)
+        self.assertGreater(queued.run_at,
+                           timezone.now() + timedelta(seconds=50))
+        self.assertEqual(queue.work(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        queue.work()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts),
+                         (Task.FAILED, 2))
+        self.assertEqual(CALLS, ['ошибка', 'ошибка'])
+
+    def test_stale_tasks_are_released(self):
+        """Задачи упавшего воркера возвращаются в очередь"""
+        record.delay('зависла')
+        Task.objects.update(status=Task.RUNNING,
+                            locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(queue.release_stale(), 1)
+        queue.work()
+        self.assertEqual(CALLS, ['зависла'])
+
+    def test_stale_task_without_attempts_fails(self):
+        """Задача, исчерпавшая попытки, не возвращается в очередь,
+        а помечается FAILED"""
+        fail.delay('роняет воркер')
+        Task.objects.update(status=Task.RUNNING, attempts=2,
+                            locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(queue.release_stale(), 0)
+        stale = Task.objects.get()
+        self.assertEqual(stale.status, Task.FAILED)
+        self.assertEqual(queue.work(), 0)
+        self.assertEqual(CALLS, [])
+
+    def test_prune_skips_renewed_follow(self):
+        """Отложенная очистка ленты не трогает возобновлённую
+        подписку"""
+        reader = User.objects.create(username='Тестовый читатель')
+        Follow.objects.create(user=reader, author=self.author)
+        Post.objects.create(text='Пост', author=self.author)
+        queue.work()
+        tasks.prune_timeline(reader.pk, self.author.pk)
+        self.assertTrue(TimelineEntry.objects.filter(user=reader).exists())
+
+    def test_side_effects_are_deferred(self):
+        """Счётчики и поисковый индекс обновляются воркером"""
+        post = Post.objects.create(text='Пост про море', author=self.author)
+        Comment.objects.create(post=post, author=self.author,
+                               text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.author.profile.posts_count, 0)
+
+        output = StringIO()
+        call_command('run_tasks', once=True, stdout=output)
+        self.assertIn('Выполнено задач', output.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 1)
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+    @override_settings(TASK_RETENTION=0)
+    def test_purge_finished(self):
+        """Выполненные задачи удаляются после TASK_RETENTION"""
+        record.delay('готово')
+        fail.delay('ошибка')
+        queue.work()
+        self.assertEqual(queue.purge_finished(), 1)
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
+
+
+@override_settings(TASK_QUEUE='local')
+class LocalQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_runs_after_commit_and_logs_errors(self):
+        """Локальная очередь выполняет задачи после коммита, а ошибки
+        задач не прерывают запрос"""
+        with transaction.atomic():
+            record.delay('после коммита')
+            self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, ['после коммита'])
+        with self.assertLogs('posts.queue', 'ERROR'):
+            fail.delay('ошибка')
+        self.assertEqual(CALLS, ['после коммита', 'ошибка'])
+        with transaction.atomic():
+            record.delay('откат')
+            transaction.set_rollback(True)
+        self.assertEqual(CALLS, ['после коммита', 'ошибка'])
+        self.assertFalse(Task.objects.exists())
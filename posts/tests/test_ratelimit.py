@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import ratelimit
+from posts.models import Comment, Follow, Post, User
+
+RATE_LIMITS = {
+    'post': {'user': '2/m', 'ip': '10/m'},
+    'comment': {'user': '10/m', 'ip': '3/m'},
+    'follow': {'user': '2/m'},
+    'api': {'user': '100/m', 'ip': '100/m'},
+}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS)
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Тестовый автор')
+        cls.other = User.objects.create(username='Другой автор')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        # Начало минутного окна: счётчики не разъезжаются по окнам.
+        patcher = mock.patch('posts.ratelimit.time.time',
+                             return_value=60 * 1000)
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_post(self, client=None):
+        client = client or self.authorized_client
+        return client.post(reverse('new_post'), {'text': 'Новый пост'})
+
+    def test_user_budget(self):
+        """Сверх бюджета пользователя запись отклоняется с 429,
+        а заголовки показывают остаток"""
+        response = self.new_post()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['X-RateLimit-Limit'], '2')
+        self.assertEqual(response['X-RateLimit-Remaining'], '1')
+        self.assertEqual(self.new_post()['X-RateLimit-Remaining'], '0')
+        response = self.new_post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+        # GET формы не расходует бюджет.
+        response = self.authorized_client.get(reverse('new_post'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-RateLimit-Limit', response)
+
+    def test_sliding_window(self):
+        """Попадания прошлого окна учитываются пропорционально
+        оставшейся в скользящем окне доле"""
+        self.new_post()
+        self.new_post()
+        self.time.return_value = 60 * 1001 + 15
+        self.assertEqual(self.new_post().status_code, 429)
+        self.time.return_value = 60 * 1001 + 30
+        self.assertEqual(self.new_post().status_code, 302)
+        self.assertEqual(self.new_post().status_code, 429)
+        self.time.return_value = 60 * 1002 + 30
+        self.assertEqual(self.new_post().status_code, 302)
+
+    def test_ip_budget(self):
+        """Бюджет IP-адреса общий для всех пользователей с него"""
+        url = reverse('add_comment', args=(self.other.username,
+                                           self.post.pk))
+        statuses = []
+        for user in (self.user, self.other):
+            client = Client()
+            client.force_login(user)
+            for _ in range(2):
+                response = client.post(url, {'text': 'Комментарий'})
+                statuses.append(response.status_code)
+        self.assertEqual(statuses, [302, 302, 302, 429])
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_client_ip_behind_proxies(self):
+        """За доверенными прокси адрес клиента берётся из
+        X-Forwarded-For, а подделанные клиентом адреса не учитываются"""
+        request = mock.Mock(META={
+            'REMOTE_ADDR': '10.0.0.2',
+            'HTTP_X_FORWARDED_FOR': '6.6.6.6, 203.0.113.7, 10.0.0.1',
+        })
+        cases = ((0, '10.0.0.2'), (1, '10.0.0.1'), (2, '203.0.113.7'),
+                 (4, '10.0.0.2'))
+        for proxies, address in cases:
+            with self.subTest(proxies=proxies):
+                with self.settings(TRUSTED_PROXY_COUNT=proxies):
+                    self.assertEqual(ratelimit.client_ip(request), address)
+
+    def test_follow_links(self):
+        """Подписка и отписка по ссылкам расходуют общий бюджет"""
+        urls = (
+            reverse('profile_follow', args=(self.other.username,)),
+            reverse('profile_unfollow', args=(self.other.username,)),
+            reverse('profile_follow', args=(self.other.username,)),
+        )
+        statuses = [self.authorized_client.get(url).status_code
+                    for url in urls]
+        self.assertEqual(statuses, [302, 302, 429])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_rejected_requests_are_not_counted(self):
+        """Отклонённые запросы не продлевают блокировку"""
+        for _ in range(10):
+            self.new_post()
+        usage = ratelimit.check(mock.Mock(user=self.user,
+                                          META={'REMOTE_ADDR': '127.0.0.1'}),
+                                'post')
+        self.assertEqual((usage.allowed, usage.remaining), (False, 0))
+        self.time.return_value = 60 * 1002
+        self.assertEqual(self.new_post().status_code, 302)
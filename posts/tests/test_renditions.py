@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from posts import renditions
+from posts.models import Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded_image(name='image.png', size=(100, 50), color=(200, 0, 0)):
+    file = BytesIO()
+    Image.new('RGB', size, color).save(file, 'png')
+    return SimpleUploadedFile(name, file.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RenditionsTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='Тестовый автор')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def create_post(self, text='Тестовый текст', color=(200, 0, 0)):
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': text,
+            'image': uploaded_image(color=color),
+        })
+        return Post.objects.get(text=text)
+
+    @staticmethod
+    def media_path(url):
+        return f'{MEDIA_ROOT}/{url[len(settings.MEDIA_URL):]}'
+
+    def test_renditions_are_generated_after_upload(self):
+        """После загрузки картинки создаются варианты всех ширин
+        и форматов"""
+        post = self.create_post()
+        urls = post.rendition_urls
+        image = Image.open(self.media_path(urls['card']))
+        self.assertEqual(image.size, renditions.CARD_SIZE)
+        sources = {source['type']: source['srcset']
+                   for source in urls['sources']}
+        sources['image/jpeg'] = urls['srcset']
+        self.assertIn('image/webp', sources)
+        for mime, srcset in sources.items():
+            candidates = [candidate.split() for candidate in
+                          srcset.split(', ')]
+            self.assertEqual([width for _, width in candidates],
+                             [f'{width}w' for width in renditions.WIDTHS])
+            for url, width in candidates:
+                with self.subTest(mime=mime, width=width):
+                    image = Image.open(self.media_path(url))
+                    self.assertEqual(Image.MIME[image.format], mime)
+                    self.assertEqual(f'{image.width}w', width)
+
+    def test_same_image_is_processed_once(self):
+        """Варианты одинаковых картинок разных постов создаются
+        один раз"""
+        first = self.create_post()
+        with mock.patch('posts.renditions.build') as build:
+            second = self.create_post(text='Второй пост')
+        build.assert_not_called()
+        self.assertEqual(first.rendition_urls, second.rendition_urls)
+
+    def test_pages_show_renditions(self):
+        """Страницы показывают варианты картинки, а до их создания
+        не показывают исходный файл с метаданными"""
+        post = self.create_post()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, post.rendition_urls['card'])
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'type="image/webp"')
+
+        Post.objects.filter(pk=post.pk).update(renditions='')
+        response = self.client.get(reverse('profile', kwargs={
+            'username': self.author.username}))
+        self.assertNotContains(response, post.image.url)
+
+    def test_new_image_replaces_renditions(self):
+        """Новая картинка при редактировании получает новые миниатюры"""
+        post = self.create_post()
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={
+                'username': self.author.username,
+                'post_id': post.pk,
+            }),
+            data={'text': 'Новый текст',
+                  'image': uploaded_image('other.png', (50, 100))},
+        )
+        edited = Post.objects.get()
+        self.assertNotEqual(edited.image, post.image)
+        self.assertNotEqual(edited.rendition_urls, post.rendition_urls)
+
+    def test_image_changed_outside_views(self):
+        """Варианты пересоздаются при смене картинки любым save(),
+        например из админки, и не трогаются при правке текста"""
+        post = self.create_post()
+        generated = post.rendition_urls
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(Post.objects.get().rendition_urls, generated)
+        post.image = uploaded_image('other.png', (50, 100))
+        post.save(update_fields=['image'])
+        regenerated = Post.objects.get().rendition_urls
+        self.assertTrue(regenerated)
+        self.assertNotEqual(regenerated, generated)
+        post.image = None
+        post.save()
+        self.assertEqual(Post.objects.get().renditions, '')
+
+    def test_stale_renditions_are_not_saved(self):
+        """Миниатюры не сохраняются, если картинка успела смениться"""
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(renditions='', image='')
+        renditions.generate(post.pk)
+        self.assertEqual(Post.objects.get().renditions, '')
+
+    def test_legacy_thumbnails_are_prefetched(self):
+        """URL старых миниатюр sorl для страницы берутся из кэша одним
+        get_many, а при промахе — через get_thumbnail()"""
+        for index in range(3):
+            self.create_post(text=f'Пост {index}', color=(index, 0, 0))
+        Post.objects.update(renditions='')
+        posts = list(Post.objects.order_by('pk'))
+        legacy = [
+            get_thumbnail(post.image, renditions.LEGACY_THUMBNAIL[0],
+                          **renditions.LEGACY_THUMBNAIL[1])
+            for post in posts
+        ]
+        renditions.prefetch(posts)
+        self.assertEqual([post.legacy_thumbnail for post in posts],
+                         [thumbnail.url for thumbnail in legacy])
+
+        posts = list(Post.objects.order_by('pk'))
+        with self.assertNumQueries(0), mock.patch(
+                'posts.renditions.get_thumbnail') as thumbnail:
+            renditions.prefetch(posts)
+        thumbnail.assert_not_called()
+        self.assertEqual([post.legacy_thumbnail for post in posts],
+                         [thumbnail.url for thumbnail in legacy])
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, legacy[0].url)
@@ -0,0 +1,160 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+from posts.stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к одной основе"""
+        forms = (
+            ('котик', 'котики', 'котиков', 'Котиками'),
+            ('красивая', 'красивые', 'красивый'),
+            ('ёлка', 'ёлки', 'елкой'),
+            ('программирование', 'программированию'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.commenter = User.objects.create(username='Комментатор')
+
+    def setUp(self):
+        cache.clear()
+        with connection.cursor() as cursor:
+            search.get_index().clear(cursor)
+        self.client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(text=text, author=self.author)
+
+    def found(self, query, cursor=None, per_page=10):
+        page = search.find_posts(query, cursor, per_page)
+        return [post.pk for post in page], page
+
+    def test_search_finds_word_forms(self):
+        """Поиск находит посты с другими формами слов запроса"""
+        post = self.create_post('Фотографии моих котиков на даче')
+        self.create_post('Собака на прогулке')
+        self.assertEqual(self.found('котик')[0], [post.pk])
+        self.assertEqual(self.found('фотография котика')[0], [post.pk])
+        self.assertEqual(self.found('котик собака')[0], [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов
+        и комментариев"""
+        post = self.create_post('Старый текст')
+        post.text = 'Новый текст про море'
+        post.save()
+        self.assertEqual(self.found('старый')[0], [])
+        self.assertEqual(self.found('морем')[0], [post.pk])
+
+        comment = Comment.objects.create(post=post, author=self.commenter,
+                                         text='Отличные фотографии')
+        self.assertEqual(self.found('фотографиям')[0], [post.pk])
+        comment.delete()
+        self.assertEqual(self.found('фотографиям')[0], [])
+
+        post.delete()
+        self.assertEqual(self.found('море')[0], [])
+
+    def test_post_text_ranks_above_comments(self):
+        """Совпадение в тексте поста важнее совпадения в комментарии"""
+        commented = self.create_post('Прогулка по лесу')
+        Comment.objects.create(post=commented, author=self.commenter,
+                               text='Какая погода')
+        post = self.create_post('Отличная погода сегодня')
+        self.assertEqual(self.found('погода')[0], [post.pk, commented.pk])
+
+    def test_keyset_pagination(self):
+        """Результаты листаются курсором без пропусков и повторов"""
+        posts = [self.create_post(f'Пост номер {index} про лето')
+                 for index in range(5)]
+        found = []
+        ids, page = self.found('лето', per_page=2)
+        found += ids
+        while page.has_next():
+            ids, page = self.found('лето', page.next_cursor, per_page=2)
+            self.assertLessEqual(len(ids), 2)
+            found += ids
+        self.assertCountEqual(found, [post.pk for post in posts])
+        self.assertEqual(len(set(found)), len(found))
+
+    @override_settings(SEARCH_CACHE_RESULTS=3)
+    def test_ranked_results_are_cached(self):
+        """Первые результаты запроса берутся из кэша, а страницы за их
+        пределами — из индекса"""
+        posts = [self.create_post(f'Пост номер {index} про зиму')
+                 for index in range(5)]
+        first_page = self.found('зима', per_page=2)[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.found('зима', per_page=2)[0], first_page)
+        found = []
+        ids, page = self.found('зима', per_page=2)
+        found += ids
+        while page.has_next():
+            ids, page = self.found('зима', page.next_cursor, per_page=2)
+            found += ids
+        self.assertEqual(sorted(found), [post.pk for post in posts])
+
+    @override_settings(SEARCH_CACHE_RESULTS=5)
+    def test_page_past_cached_results_on_cold_cache(self):
+        """Страница за пределами кэша при пустом кэше читается из
+        индекса с теми же параметрами запроса"""
+        posts = [self.create_post(f'Кошка номер {index}')
+                 for index in range(12)]
+        ids, _ = self.found('кошка', per_page=len(posts))
+        self.assertCountEqual(ids, [post.pk for post in posts])
+
+    def test_comment_has_own_index_row(self):
+        """Комментарий индексируется отдельно от поста и других
+        комментариев"""
+        post = self.create_post('Прогулка по лесу')
+        first = Comment.objects.create(post=post, author=self.commenter,
+                                       text='Грибы')
+        second = Comment.objects.create(post=post, author=self.commenter,
+                                        text='Ягоды')
+        first.text = 'Шишки'
+        first.save()
+        self.assertEqual(self.found('гриб')[0], [])
+        self.assertEqual(self.found('шишка')[0], [post.pk])
+        self.assertEqual(self.found('ягоды')[0], [post.pk])
+        second.delete()
+        self.assertEqual(self.found('ягоды')[0], [])
+        self.assertEqual(self.found('лес')[0], [post.pk])
+
+    def test_rebuild(self):
+        """Индекс можно построить заново по всем постам"""
+        post = self.create_post('Книга о погоде')
+        Comment.objects.create(post=post, author=self.commenter,
+                               text='Интересные главы')
+        with connection.cursor() as cursor:
+            search.get_index().clear(cursor)
+        self.assertEqual(search.rebuild(batch_size=1), 1)
+        self.assertEqual(self.found('главы')[0], [post.pk])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты"""
+        post = self.create_post('Фотографии звёздного неба')
+        self.create_post('Ничего интересного')
+        response = self.client.get(reverse('search'), {'q': 'звездное'})
+        self.assertEqual(list(response.context['page']), [post])
+        self.assertContains(response, post.text)
+
+    def test_query_without_words(self):
+        """Запрос без слов не ищет ничего и не ломает FTS5"""
+        self.create_post('Текст')
+        for query in ('', '"', '!!! ---', 'NEAR(', '*'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query)[0], [])
+        response = self.client.get(reverse('search'), {'q': '"'})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TransactionTestCase, override_settings
+
+from posts.models import ImageBlob, Post, User
+from posts.storage import ContentAddressedStorage, replace_file
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create(username='Тестовый автор')
+        self.storage = Post._meta.get_field('image').storage
+
+    def create_post(self, content, name='image.png'):
+        post = Post(text='Тестовый текст', author=self.author)
+        post.image.save(name, ContentFile(content))
+        return post
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые файлы хранятся один раз под именем по хешу"""
+        first = self.create_post(b'content', 'first.PNG')
+        second = self.create_post(b'content', 'second.png')
+        third = self.create_post(b'other content')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, third.image.name)
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        directory = os.path.dirname(self.storage.path(first.image.name))
+        self.assertEqual(os.listdir(directory),
+                         [os.path.basename(first.image.name)])
+        self.assertEqual(
+            dict(ImageBlob.objects.values_list('name', 'refcount')),
+            {first.image.name: 2, third.image.name: 1})
+
+    def test_unreferenced_files_are_deleted(self):
+        """Файл удаляется, когда на него не остаётся ссылок"""
+        first = self.create_post(b'content')
+        second = self.create_post(b'content')
+        name = first.image.name
+
+        first.delete()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+        second.image.save('other.png', ContentFile(b'other content'))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertEqual(
+            ImageBlob.objects.get(name=second.image.name).refcount, 1)
+
+    def test_uploaded_copy_is_kept_until_its_post_is_saved(self):
+        """Файл, который только что загрузили повторно, не удаляется,
+        даже если последний пост с ним удалён до сохранения нового"""
+        first = self.create_post(b'content')
+        name = self.storage.save('posts/copy.png', ContentFile(b'content'))
+        self.assertEqual(name, first.image.name)
+
+        first.delete()
+        self.assertTrue(self.storage.exists(name))
+        second = Post(text='Тестовый текст', author=self.author, image=name)
+        second.save()
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+        self.assertEqual(ImageBlob.objects.get(name=name).pending, 0)
+
+        second.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reupload_of_same_file_releases_hold(self):
+        """Повторная загрузка того же файла при правке поста не
+        удерживает его навсегда"""
+        post = self.create_post(b'content')
+        name = post.image.name
+        # Так картинку присваивают форма, админка и API.
+        post.image = ContentFile(b'content', name='form.png')
+        post.save()
+        self.assertEqual(post.image.name, name)
+        blob = ImageBlob.objects.get(name=name)
+        self.assertEqual((blob.refcount, blob.pending), (1, 0))
+
+        post.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_interrupted_write_leaves_no_file(self):
+        """Оборванная запись не оставляет недописанный файл под
+        итоговым именем, а готовый файл заменяется целиком"""
+        class BrokenFile(ContentFile):
+            def chunks(self, chunk_size=None):
+                yield b'half'
+                raise OSError('Нет места на диске')
+
+        name = 'renditions/test/360.jpg'
+        with self.assertRaises(OSError):
+            replace_file(default_storage, name, BrokenFile(b''))
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(os.listdir(default_storage.path('renditions/test')),
+                         [])
+
+        replace_file(default_storage, name, ContentFile(b'old'))
+        replace_file(default_storage, name, ContentFile(b'new'))
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), b'new')
+
+    def test_storage_is_deconstructible(self):
+        """Хранилище сериализуется в миграции"""
+        path, args, kwargs = ContentAddressedStorage().deconstruct()
+        self.assertEqual(path, 'posts.storage.ContentAddressedStorage')
@@ -4,10 +4,14 @@ import tempfile
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from posts.middleware import page_cache_stats
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.pagination import COMMENTS_PER_PAGE, CachedCountList
+from posts.templatetags.pagination import page_window
 
 settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -204,17 +208,38 @@ class PostsPagesTests(TestCase):
     def test_cache_works_on_index_page(self):
         """Кэш работает на странице index"""
         response_before_post = self.authorized_client.get(reverse('index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response_after_update = self.authorized_client.get(reverse('index'))
+        (self.assertEqual(response_before_post.content,
+                          response_after_update.content))
+        cache.clear()
+        response_after_clear = self.authorized_client.get(reverse('index'))
+        (self.assertNotEqual(response_before_post.content,
+                             response_after_clear.content))
+
+    def test_index_cache_is_invalidated_by_writes(self):
+        """Кэш index сбрасывается при создании поста и комментария"""
+        response_before_post = self.authorized_client.get(reverse('index'))
         Post.objects.create(
             text='Тестовый текст_2',
             author=self.post.author,
         )
         response_after_post = self.authorized_client.get(reverse('index'))
-        (self.assertEqual(response_before_post.content,
-                          response_after_post.content))
-        cache.clear()
-        response_after_clear = self.authorized_client.get(reverse('index'))
         (self.assertNotEqual(response_before_post.content,
-                             response_after_clear.content))
+                             response_after_post.content))
+        self.assertContains(response_after_post, 'Тестовый текст_2')
+
+        Comment.objects.create(post=self.post, author=self.user_2,
+                               text='Тестовый комментарий')
+        response_after_comment = self.authorized_client.get(reverse('index'))
+        self.assertContains(response_after_comment, 'Комментариев: 1')
+
+    def test_index_cache_varies_on_user(self):
+        """Кэш index хранится отдельно для каждого пользователя"""
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Редактировать')
+        response = self.client.get(reverse('index'))
+        self.assertNotContains(response, 'Редактировать')
 
     def test_authorized_client_can_follow_other_users(self):
         """Авторизованный пользователь может подписываться на
@@ -292,3 +317,563 @@ class PaginatorViewsTest(TestCase):
         response = self.authorized_client.get(reverse('index') + '?page=2')
         (self.assertEqual(len(response.context['page']),
                           len(Post.objects.all()) - 10))
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсорная пагинация отдает все посты без повторов"""
+        response = self.authorized_client.get(reverse('index') + '?cursor=')
+        page = response.context['page']
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_previous())
+
+        response = self.authorized_client.get(
+            reverse('index') + f'?cursor={page.next_cursor}')
+        page_2 = response.context['page']
+        self.assertEqual(len(page_2), 3)
+        self.assertFalse(page_2.has_next())
+        (self.assertEqual([post.id for post in page]
+                          + [post.id for post in page_2],
+                          list(Post.objects.values_list('id', flat=True))))
+
+        response = self.authorized_client.get(
+            reverse('index') + f'?cursor={page_2.previous_cursor}')
+        (self.assertEqual([post.id for post in response.context['page']],
+                          [post.id for post in page]))
+
+    def test_paginator_count_is_cached(self):
+        """Число постов для паджинатора берется из кэша и
+        сбрасывается при создании поста"""
+        cache.clear()
+        feed = CachedCountList(Post.objects.feed(), 'index')
+        with self.assertNumQueries(1):
+            self.assertEqual(feed.count(), 13)
+        with self.assertNumQueries(0):
+            self.assertEqual(feed.count(), 13)
+
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response.context['paginator'].count, 14)
+
+    def test_paginator_count_is_invalidated_per_feed(self):
+        """Создание поста сбрасывает количество только в его лентах,
+        а комментарии не сбрасывают количество постов"""
+        cache.clear()
+        other = User.objects.create(username='Другой автор')
+        feeds = {
+            'index': Post.objects.feed(),
+            f'author:{self.user.pk}': self.user.posts.feed(),
+            f'author:{other.pk}': other.posts.feed(),
+        }
+        for scope, queryset in feeds.items():
+            CachedCountList(queryset, scope).count()
+
+        post = Post.objects.create(text='Новый пост', author=self.user)
+        Comment.objects.create(post=post, author=other, text='Комментарий')
+        for scope, queries in (('index', 1), (f'author:{self.user.pk}', 1),
+                               (f'author:{other.pk}', 0)):
+            with self.subTest(scope=scope):
+                with self.assertNumQueries(queries):
+                    CachedCountList(feeds[scope], scope).count()
+        Comment.objects.create(post=post, author=other, text='Ещё один')
+        with self.assertNumQueries(0):
+            CachedCountList(feeds['index'], 'index').count()
+
+    def test_page_window_is_bounded(self):
+        """Навигация показывает окно страниц вокруг текущей"""
+        paginator = Paginator(range(1000), 10)
+        self.assertEqual(page_window(paginator.page(1)), [1, 2, 3, None, 100])
+        (self.assertEqual(page_window(paginator.page(50)),
+                          [1, None, 48, 49, 50, 51, 52, None, 100]))
+        self.assertEqual(page_window(paginator.page(100)),
+                         [1, None, 98, 99, 100])
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('index') + '?cursor=broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 10)
+
+
+class FeedQueriesTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create(username='Тестовый автор')
+        cls.reader = User.objects.create(username='Тестовый читатель')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+        for text in range(10):
+            post = Post.objects.create(
+                text=text,
+                author=cls.user,
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=post,
+                author=cls.reader,
+                text='Тестовый комментарий',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feed_pages_query_count_does_not_depend_on_posts(self):
+        """Число запросов к БД на страницах ленты не зависит
+        от количества постов на странице"""
+        urls_queries = {
+            reverse('index'): 4,
+            reverse('group', kwargs={'slug': self.group.slug}): 7,
+            reverse('profile', kwargs={'username': self.user}): 9,
+            reverse('follow_index'): 6,
+        }
+        for url, queries in urls_queries.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = self.authorized_client.get(url)
+                self.assertEqual(len(response.context['page']), 10)
+
+    def test_feed_posts_have_comment_count(self):
+        """Посты в ленте содержат число комментариев"""
+        response = self.authorized_client.get(reverse('index'))
+        for post in response.context['page']:
+            with self.subTest(post=post):
+                self.assertEqual(post.comment_count, 1)
+
+
+class CommentsPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        cls.commenters = [User.objects.create(username=f'Комментатор {i}')
+                          for i in range(3)]
+        for index in range(COMMENTS_PER_PAGE * 2 + 5):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.commenters[index % len(cls.commenters)],
+                text=f'Комментарий {index}',
+            )
+        cls.kwargs = {'username': cls.author.username,
+                      'post_id': cls.post.pk}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_renders_first_comments(self):
+        """Страница поста показывает только первую порцию комментариев,
+        новые сверху, и ссылку на следующую"""
+        response = self.client.get(reverse('post', kwargs=self.kwargs))
+        comments = list(response.context['comments'])
+        self.assertEqual(comments,
+                         list(self.post.comments.all()[:COMMENTS_PER_PAGE]))
+        self.assertContains(response, 'js-more-comments')
+        self.assertContains(response,
+                            reverse('post_comments', kwargs=self.kwargs))
+
+    def test_post_page_queries_do_not_depend_on_comments(self):
+        """Авторы комментариев не читаются отдельными запросами"""
+        with self.assertNumQueries(3):
+            self.client.get(reverse('post', kwargs=self.kwargs))
+
+    def test_comment_chunks_cover_all_comments(self):
+        """Порции комментариев идут подряд без пропусков и повторов,
+        в HTML и в JSON"""
+        url = reverse('post_comments', kwargs=self.kwargs)
+        found = []
+        cursor = None
+        while True:
+            params = {'format': 'json'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(url, params).json()
+            self.assertLessEqual(len(data['comments']), COMMENTS_PER_PAGE)
+            found += [comment['id'] for comment in data['comments']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(found, list(self.post.comments.values_list(
+            'pk', flat=True)))
+
+        response = self.client.get(url, {'cursor': cursor or ''})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+
+
+class TimelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.reader = User.objects.create(username='Тестовый читатель')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def get_follow_page(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка добавляет в ленту старые посты автора,
+        отписка убирает их"""
+        (self.authorized_client.get(reverse('profile_follow',
+                                    kwargs={'username': self.author})))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.get_follow_page(), [self.old_post.text])
+
+        (self.authorized_client.get(reverse('profile_unfollow',
+                                    kwargs={'username': self.author})))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.get_follow_page(), [])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.get_follow_page(),
+                         [post.text, self.old_post.text])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_demand(self):
+        """Посты автора с большим числом подписчиков не раскладываются
+        по лентам, но видны в ленте подписок"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.get_follow_page(),
+                         [post.text, self.old_post.text])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_leaving_popular_is_backfilled(self):
+        """Посты, вышедшие, пока автор был популярным, остаются
+        в лентах, когда подписчиков становится меньше"""
+        other = User.objects.create(username='Другой читатель')
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+        follow.delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.get_follow_page(),
+                         [post.text, self.old_post.text])
+
+
+class FollowPageCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.author_2 = User.objects.create(username='Тестовый автор_2')
+        cls.reader = User.objects.create(username='Тестовый читатель')
+        cls.reader_2 = User.objects.create(username='Тестовый читатель_2')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader_2, author=cls.author_2)
+        for text in range(13):
+            Post.objects.create(text=f'Пост {text}', author=cls.author)
+        cls.post_2 = Post.objects.create(text='Пост автора_2',
+                                         author=cls.author_2)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.reader_2_client = Client()
+        self.reader_2_client.force_login(self.reader_2)
+
+    def test_follow_page_is_cached_per_user_and_page(self):
+        """Лента подписок кэшируется отдельно для каждого
+        пользователя и страницы"""
+        page_1 = self.reader_client.get(reverse('follow_index')).content
+        page_2 = self.reader_client.get(
+            reverse('follow_index') + '?page=2').content
+        other = self.reader_2_client.get(reverse('follow_index')).content
+        self.assertNotEqual(page_1, page_2)
+        self.assertNotIn(self.post_2.text.encode(), page_1)
+        self.assertIn(self.post_2.text.encode(), other)
+
+    def test_follow_page_is_cached_until_changes(self):
+        """Кэш ленты подписок сбрасывается только при изменениях
+        в ней"""
+        self.reader_client.get(reverse('follow_index'))
+        Post.objects.filter(author=self.author).update(text='Без сигналов')
+        response = self.reader_client.get(reverse('follow_index'))
+        self.assertNotContains(response, 'Без сигналов')
+
+        Post.objects.create(text='Чужой пост', author=self.author_2)
+        response = self.reader_client.get(reverse('follow_index'))
+        self.assertNotContains(response, 'Без сигналов')
+
+        post = Post.objects.filter(author=self.author).first()
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.reader_client.get(reverse('follow_index'))
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_follow_page_key_ignores_other_parameters(self):
+        """Посторонние параметры запроса не создают новых записей
+        в кэше ленты"""
+        url = reverse('follow_index')
+        self.reader_client.get(url)
+        self.reader_client.get(url + '?page=2')
+        Post.objects.filter(author=self.author).update(text='Без сигналов')
+        for query in ('?utm_source=mail', '?page=2&utm_source=mail'):
+            with self.subTest(query=query):
+                response = self.reader_client.get(url + query)
+                self.assertNotContains(response, 'Без сигналов')
+
+    def test_author_rename_resets_follow_page(self):
+        """Переименование автора сбрасывает кэш ленты"""
+        self.reader_client.get(reverse('follow_index'))
+        self.author.username = 'Переименованный автор'
+        self.author.save()
+        response = self.reader_client.get(reverse('follow_index'))
+        self.assertContains(response, '@Переименованный автор')
+
+
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.author_2 = User.objects.create(username='Тестовый автор_2')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа_2',
+            slug='test-slug-2',
+            description='Тестовое описание_2',
+        )
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.urls = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': self.group.slug}),
+            'profile': reverse('profile',
+                               kwargs={'username': self.author.username}),
+            'post': reverse('post', kwargs={
+                'username': self.author.username,
+                'post_id': self.post.pk,
+            }),
+        }
+
+    def assertCached(self, name, cached=True):
+        response = self.client.get(self.urls[name])
+        self.assertEqual(response['X-Cache'], 'HIT' if cached else 'MISS')
+        return response
+
+    def test_anonymous_pages_are_cached(self):
+        """Страницы для анонимов отдаются из кэша без рендеринга"""
+        for name in self.urls:
+            with self.subTest(name=name):
+                first = self.assertCached(name, cached=False)
+                with self.assertNumQueries(0):
+                    second = self.assertCached(name)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(second['Content-Type'],
+                                 first['Content-Type'])
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы для авторизованных пользователей не кэшируются"""
+        for url in self.urls.values():
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertFalse(response.has_header('X-Cache'))
+
+    def test_pages_are_purged_by_surrogate_keys(self):
+        """Изменения сбрасывают только страницы с их ключами"""
+        writes = {
+            'comment': (
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.author_2, text='Коммент'),
+                {'index', 'group', 'profile', 'post'},
+            ),
+            'other_group_post': (
+                lambda: Post.objects.create(
+                    text='Другой пост', author=self.author_2,
+                    group=self.group_2),
+                {'index'},
+            ),
+            'follow': (
+                lambda: Follow.objects.create(user=self.author_2,
+                                              author=self.author),
+                {'profile', 'post'},
+            ),
+            'post_edit': (
+                lambda: Post.objects.filter(pk=self.post.pk).get().save(),
+                {'index', 'group', 'profile', 'post'},
+            ),
+        }
+        for write, (make_change, purged) in writes.items():
+            with self.subTest(write=write):
+                for name in self.urls:
+                    self.client.get(self.urls[name])
+                make_change()
+                for name in self.urls:
+                    self.assertCached(name, cached=name not in purged)
+
+    def test_renames_purge_pages_with_names(self):
+        """Правка группы или автора сбрасывает все страницы, где
+        показаны их карточки"""
+        for instance in (self.group, self.author):
+            with self.subTest(instance=instance):
+                for url in self.urls.values():
+                    self.client.get(url)
+                instance.save()
+                for name in self.urls:
+                    self.assertCached(name, cached=False)
+
+    def test_hits_and_misses_are_counted(self):
+        """Попадания и промахи кэша страниц подсчитываются, а ответы,
+        которые не кэшируются, в промахи не попадают"""
+        for _ in range(3):
+            self.client.get(self.urls['index'])
+        self.client.get(reverse('group', kwargs={'slug': 'missing'}))
+        self.client.get(reverse('about:author'))
+        self.assertEqual(page_cache_stats(), {'hits': 2, 'misses': 1})
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create(username='Тестовый автор')
+        cls.reader = User.objects.create(username='Тестовый читатель')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs={
+                'username': self.author.username,
+                'post_id': self.post.pk,
+            }),
+            reverse('follow_index'),
+        ]
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Неизменившиеся страницы отдаются ответом 304"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                response = self.reader_client.get(url,
+                                                  HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_cached_anonymous_pages_return_not_modified(self):
+        """Страницы из кэша для анонимов тоже отдаются ответом 304"""
+        url = self.urls[0]
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Редактирование поста и комментарии меняют ETag"""
+        changes = {
+            'edit': lambda: self.post.save(),
+            'comment': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Коммент'),
+        }
+        for change, make_change in changes.items():
+            etags = {url: self.reader_client.get(url)['ETag']
+                     for url in self.urls}
+            make_change()
+            for url, etag in etags.items():
+                with self.subTest(change=change, url=url):
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_login_invalidates_etag(self):
+        """После нового входа страница с формой не отдаётся ответом
+        304: в старой форме устаревший CSRF-токен"""
+        User.objects.create_user('Тестовый гость', password='password')
+        client = Client(enforce_csrf_checks=True)
+        credentials = {'username': 'Тестовый гость', 'password': 'password'}
+        login_url = reverse('login')
+        client.get(login_url)
+        client.post(login_url, {
+            **credentials,
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+        url = self.urls[3]
+        etag = client.get(url)['ETag']
+        client.logout()
+        client.get(login_url)
+        client.post(login_url, {
+            **credentials,
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(TASK_QUEUE='db')
+    def test_follow_invalidates_profile_etag(self):
+        """Кнопка подписки обновляется сразу, до сброса кэша задачей"""
+        url = reverse('profile', kwargs={'username': self.reader.username})
+        author_client = Client()
+        author_client.force_login(self.author)
+        etag = author_client.get(url)['ETag']
+        Follow.objects.create(user=self.author, author=self.reader)
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
+    def test_etag_depends_on_user(self):
+        """ETag страницы различается для разных пользователей"""
+        for url in self.urls[:4]:
+            with self.subTest(url=url):
+                self.assertNotEqual(self.client.get(url)['ETag'],
+                                    self.reader_client.get(url)['ETag'])
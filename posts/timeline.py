@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли посты автора по лентам подписчиков."""
+    followers = (Profile.objects.filter(user_id=author_id)
+                 .values_list('followers_count', flat=True).first())
+    return (followers or 0) <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def popular_authors(user):
+    """Авторы из подписок user, посты которых не раскладываются
+    по лентам."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def timeline_posts(user, popular=None):
+    """Посты авторов, на которых подписан user.
+
+    Обычные авторы читаются из материализованной ленты пользователя,
+    авторы из popular_authors() — напрямую из Post, так как при
+    публикации их посты по лентам не раскладываются.
+    """
+    if popular is None:
+        popular = popular_authors(user)
+    if not popular:
+        # Порядок по полям самой ленты позволяет читать страницу
+        # по индексу (user, -pub_date, -post) без сортировки постов.
+        return (Post.objects.filter(timeline_entries__user=user)
+                .order_by('-timeline_entries__pub_date',
+                          F('timeline_entries__post_id').desc()))
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(Q(pk__in=entries) | Q(author_id__in=popular))
+
+
+def follow_scopes(user, popular):
+    """Области поколений, от которых зависит лента подписок user:
+    её посты, посты популярных авторов и имена авторов и групп."""
+    return ([f'follow:{user.pk}', 'names']
+            + [f'author:{pk}' for pk in popular])
+
+
+def author_scopes(author_id):
+    """Области поколений, которые нужно сбросить при изменении
+    постов автора: ленты его подписчиков или, для популярных
+    авторов, общая область автора."""
+    if not is_fanout_author(author_id):
+        return [f'author:{author_id}']
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True)
+    return [f'follow:{user_id}' for user_id in followers]
+
+
+def fan_out(post):
+    """Добавить новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, author_id=post.author_id,
+                       pub_date=post.pub_date) for user_id in followers],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту пользователя последние посты нового автора."""
+    if not is_fanout_author(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date', '-id')
+             .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT])
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                       pub_date=pub_date) for pk, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def left_popular(author_id, delta):
+    """Стал ли автор обычным после изменения числа его подписчиков
+    на delta."""
+    followers = (Profile.objects.filter(user_id=author_id)
+                 .values_list('followers_count', flat=True).first())
+    return (followers is not None
+            and followers <= settings.TIMELINE_FANOUT_LIMIT
+            < followers - delta)
+
+
+def refill(author_id):
+    """Дописать последние посты автора в ленты всех его подписчиков.
+
+    Пока автор был популярным, его посты по лентам не раскладывались
+    и читались напрямую из Post; когда он перестаёт быть популярным,
+    без этого они пропали бы из лент.
+    """
+    for user_id in Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True).iterator():
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Собрать ленту пользователя заново по его подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    for author_id in Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True):
+        backfill(user_id, author_id)
@@ -0,0 +1,185 @@
+import warnings
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.shortcuts import render
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+# Сколько первых байт файла держать в памяти, пока Pillow не сможет
+# прочитать из них заголовок картинки: у JPEG перед размерами может
+# идти EXIF размером до 64 КБ.
+HEADER_LIMIT = 256 * 1024
+
+# Форматы, которые принимаются и перекодируются, с параметрами
+# сохранения. Метаданные (EXIF, XMP, комментарии) при этом теряются.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 90},
+}
+
+INVALID_IMAGE = ('Загрузите правильное изображение. Файл, который вы '
+                 'загрузили, поврежден или не является изображением.')
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Проверка картинок прямо во время загрузки.
+
+    Стоит перед стандартными обработчиками и передаёт им данные
+    без изменений, но считает байты и по первым из них читает заголовок
+    картинки. Файл больше MAX_IMAGE_UPLOAD_SIZE, картинка больше
+    MAX_IMAGE_PIXELS пикселей (в том числе «декомпрессионная бомба»,
+    которую видно уже по заголовку) или файл, в заголовке которого нет
+    картинки, дальше не читаются и не сохраняются: разбор запроса
+    прерывается без чтения остатка тела, а причина записывается
+    в request.upload_errors для формы.
+    """
+
+    def new_file(self, field_name, file_name, content_type,
+                 content_length=None, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type,
+                         content_length, charset, content_type_extra)
+        self.received = 0
+        self.header = bytearray()
+        self.header_checked = False
+        if (content_length is not None
+                and content_length > settings.MAX_IMAGE_UPLOAD_SIZE):
+            self.reject_too_big()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.reject_too_big()
+        if not self.header_checked:
+            self.header += raw_data
+            self.check_header()
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Файл целиком меньше HEADER_LIMIT и без читаемого заголовка
+        # отклонит ImageField формы.
+        return None
+
+    def check_header(self):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                image = Image.open(BytesIO(self.header))
+        except Image.DecompressionBombError:
+            self.reject_too_many_pixels()
+        except Exception:
+            if len(self.header) >= HEADER_LIMIT:
+                self.reject(INVALID_IMAGE)
+            return
+        width, height = image.size
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            self.reject_too_many_pixels()
+        self.header_checked = True
+        self.header = None
+
+    def reject_too_big(self):
+        size = filesizeformat(settings.MAX_IMAGE_UPLOAD_SIZE)
+        self.reject(f'Размер файла не должен превышать {size}.')
+
+    def reject_too_many_pixels(self):
+        megapixels = settings.MAX_IMAGE_PIXELS / 1000 / 1000
+        self.reject(f'Картинка не должна быть больше {megapixels:g} Мп.')
+
+    def reject(self, message):
+        errors = getattr(self.request, 'upload_errors', {})
+        errors[self.field_name] = message
+        self.request.upload_errors = errors
+        raise StopUpload(connection_reset=True)
+
+
+def request_size_limit():
+    """Наибольший допустимый размер тела запроса с картинкой: сама
+    картинка и остальные поля формы. None — без ограничения."""
+    if settings.DATA_UPLOAD_MAX_MEMORY_SIZE is None:
+        return None
+    return (settings.MAX_IMAGE_UPLOAD_SIZE
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+
+def bounded_image_uploads(view):
+    """Обрабатывать файлы запроса к view через ImageUploadHandler.
+
+    Запрос, который по Content-Length больше request_size_limit(),
+    отклоняется с кодом 413 до чтения тела. Обработчик нужно добавить
+    до первого чтения request.POST, а его читает CsrfViewMiddleware,
+    поэтому CSRF проверяется уже внутри.
+    """
+    protected_view = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        limit = request_size_limit()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if limit is not None and length > limit:
+            size = filesizeformat(settings.MAX_IMAGE_UPLOAD_SIZE)
+            return render(request, 'misc/413.html', {'size': size},
+                          status=413)
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return protected_view(request, *args, **kwargs)
+    return wrapper
+
+
+def check_format(upload):
+    """Проверить по заголовку, что формат картинки можно перекодировать.
+
+    Само перекодирование идёт в фоновой задаче, см. sanitize().
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+    upload.seek(0)
+    if image_format not in SAVE_OPTIONS:
+        raise ValidationError(f'Формат {image_format} не поддерживается.')
+
+
+def reencode(data):
+    """Пересохранить картинку data без метаданных, повернув её по EXIF;
+    вернуть байты. Картинки форматов не из SAVE_OPTIONS, загруженные
+    до их проверки, возвращаются как есть."""
+    with Image.open(BytesIO(data)) as image:
+        image_format = image.format
+        if image_format not in SAVE_OPTIONS:
+            return data
+        output = BytesIO()
+        if getattr(image, 'n_frames', 1) > 1:
+            image.save(output, image_format, save_all=True)
+        else:
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+            options = dict(SAVE_OPTIONS[image_format])
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def sanitize(image):
+    """Перекодировать файл картинки поста image на месте; вернуть
+    новые байты.
+
+    Вызывается воркером очереди перед созданием вариантов, а не в
+    запросе: тяжёлое перекодирование не занимает процессы сайта, а
+    одновременно их идёт не больше, чем запущено воркеров. Имя файла
+    при этом не меняется, а замена атомарна.
+    """
+    with image.open('rb') as file:
+        data = reencode(file.read())
+    image.storage.replace(image.name, ContentFile(data))
+    return data
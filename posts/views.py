@@ -1,29 +1,40 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from . import etags
+from .cache import get_generation, tag_page
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .pagination import COMMENTS_PER_PAGE, CursorPaginator, paginate
+from .ratelimit import rate_limit
+from .search import find_posts
+from .timeline import follow_scopes, popular_authors, timeline_posts
+from .uploads import bounded_image_uploads
 
 
+@condition(etag_func=etags.index_etag)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    paginator, page = paginate(request, post_list, scope='index')
+    tag_page(request, 'posts', posts=page)
     context = {
         'page': page,
         'paginator': paginator,
+        'generation': get_generation('index', 'names'),
     }
     return render(request, 'index.html', context=context)
 
 
+@condition(etag_func=etags.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.feed()
+    paginator, page = paginate(request, post_list,
+                               scope=f'group:{group.pk}')
+    tag_page(request, f'group:{group.pk}', posts=page)
     context = {
         'group': group,
         'page': page,
@@ -32,26 +43,42 @@ def group_posts(request, slug):
     return render(request, "group.html", context=context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = find_posts(query, request.GET.get('cursor')) if query else None
+    context = {
+        'query': query,
+        'page': page,
+    }
+    return render(request, 'search.html', context=context)
+
+
 @login_required
+@rate_limit('post')
+@bounded_image_uploads
 def new_post(request):
     if request.method == 'POST':
-        form = PostForm(request.POST, files=request.FILES or None)
+        form = PostForm(request.POST, files=request.FILES or None,
+                        upload_errors=getattr(request, 'upload_errors', None))
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
             return redirect('index')
         return render(request, 'new.html', {'form': form})
     form = PostForm()
     return render(request, 'new.html', {'form': form})
 
 
+@condition(etag_func=etags.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related('profile'),
+                               username=username)
+    post_list = author.posts.feed()
+    paginator, page = paginate(request, post_list,
+                               scope=f'author:{author.pk}')
+    tag_page(request, f'author:{author.pk}', posts=page)
     user = request.user
     following = False
     buttons = False
@@ -62,7 +89,6 @@ def profile(request, username):
     context = {
         'author': author,
         'page': page,
-        'post_list': post_list,
         'paginator': paginator,
         'following': following,
         'buttons': buttons
@@ -70,33 +96,86 @@ def profile(request, username):
     return render(request, 'profile.html', context=context)
 
 
+@condition(etag_func=etags.post_etag)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    post = get_object_or_404(Post.objects.feed()
+                             .select_related('author__profile'),
+                             author__username=username, id=post_id)
     author = post.author
-    post_list = author.posts.all()
-    comments = post.comments.all()
+    tag_page(request, f'author:{author.pk}', posts=[post])
+    comments, next_cursor = first_comments(post)
     form = CommentForm()
     add_comment = True
     context = {
         'author': author,
         'post': post,
-        'post_list': post_list,
         'comments': comments,
+        'next_cursor': next_cursor,
         'form': form,
         'add_comment': add_comment,
     }
     return render(request, 'post.html', context=context)
 
 
+def comment_paginator(post):
+    return CursorPaginator(post.comments.select_related('author'),
+                           COMMENTS_PER_PAGE, ordering=('-created', '-id'))
+
+
+def first_comments(post):
+    """Первая порция комментариев поста и курсор следующей.
+
+    Порция остаётся QuerySet, а есть ли продолжение, видно по
+    денормализованному comment_count без выборки лишней строки.
+    """
+    paginator = comment_paginator(post)
+    comments = (paginator.object_list.order_by(*paginator.ordering)
+                [:paginator.per_page])
+    count = len(comments)
+    next_cursor = None
+    if count and post.comment_count > count:
+        next_cursor = paginator.encode_cursor(comments[count - 1])
+    return comments, next_cursor
+
+
+@condition(etag_func=etags.post_etag)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев: HTML-фрагмент для подгрузки
+    на странице поста или JSON при ?format=json."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, id=post_id)
+    tag_page(request, f'post:{post.pk}')
+    page = comment_paginator(post).get_page(request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            } for comment in page],
+            'next_cursor': page.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': page,
+        'next_cursor': page.next_cursor,
+    }
+    return render(request, 'includes/comment_list.html', context=context)
+
+
 @login_required
+@bounded_image_uploads
 def post_edit(request, username, post_id):
     if request.user.username != username:
         return redirect('post', username, post_id)
     post = get_object_or_404(Post, author__username=username, id=post_id)
     form = (PostForm(request.POST or None, files=request.FILES or None,
-            instance=post))
+            instance=post,
+            upload_errors=getattr(request, 'upload_errors', None)))
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('post', username, post_id)
     context = {
         'form': form,
@@ -120,6 +199,7 @@ def server_error(request):
 
 
 @login_required
+@rate_limit('comment')
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
     form = CommentForm(request.POST or None)
@@ -127,37 +207,45 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('post', username, post_id)
 
 
 @login_required
+@condition(etag_func=etags.follow_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    popular = popular_authors(request.user)
+    post_list = timeline_posts(request.user, popular).feed()
+    paginator, page = paginate(request, post_list,
+                               scope=f'follow:{request.user.pk}')
     follow = True
     context = {
         'page': page,
         'follow': follow,
         'paginator': paginator,
+        'generation': get_generation(
+            *follow_scopes(request.user, popular)),
     }
     return render(request, 'follow.html', context=context)
 
 
 @login_required
+@rate_limit('follow', methods=None)
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=user, author=author)
     return redirect('profile', username)
 
 
 @login_required
+@rate_limit('follow', methods=None)
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=user, author=author).delete()
     return redirect('profile', username)
@@ -1,4 +1,21 @@
+import pytest
+from django.core.cache import cache
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Очистка базы между тестами не вызывает сигналы, которые
+    # сбрасывают кэш страниц, поэтому кэш очищается явно.
+    cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def local_tasks(settings):
+    # Фоновые задачи выполняются в процессе теста, без воркера.
+    settings.TASK_QUEUE = 'local'
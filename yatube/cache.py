@@ -0,0 +1,347 @@
+import pickle
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+# INCRBY только существующего ключа одной атомарной командой: сам
+# INCRBY создал бы отсутствующий ключ без срока жизни.
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisClient:
+    """Минимальный клиент протокола Redis (RESP) без сторонних
+    зависимостей: только команды, нужные кэшу."""
+
+    def __init__(self, host, port, db=0, timeout=None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+
+    def connect(self):
+        self._sock = socket.create_connection((self.host, self.port),
+                                              self.timeout)
+        self._file = self._sock.makefile('rb')
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    def execute(self, *args):
+        """Выполнить команду.
+
+        Соединение, которое закрыл сервер (например, после его
+        перезапуска), заменяется новым до отправки команды. Ошибка
+        после отправки не повторяется: команда могла выполниться,
+        и повтор INCRBY посчитал бы её дважды.
+        """
+        for attempt in range(2):
+            try:
+                if self._sock is not None and self._dropped():
+                    self.close()
+                if self._sock is None:
+                    self.connect()
+                break
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+        try:
+            return self._call(*args)
+        except OSError:
+            self.close()
+            raise
+
+    def _dropped(self):
+        """Закрыл ли сервер соединение: между командами в сокете нет
+        непрочитанных данных, и EOF означает разрыв."""
+        self._sock.settimeout(0)
+        try:
+            return self._sock.recv(1, socket.MSG_PEEK) == b''
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            self._sock.settimeout(self.timeout)
+
+    def _call(self, *args):
+        self._sock.sendall(self._pack(args))
+        return self._read()
+
+    @staticmethod
+    def _pack(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('Соединение с Redis закрыто')
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b'+':
+            return rest.decode()
+        if prefix == b'-':
+            raise RedisError(rest.decode())
+        if prefix == b':':
+            return int(rest)
+        if prefix == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            return self._file.read(length + 2)[:-2]
+        if prefix == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ Redis: {line!r}')
+
+
+class RedisCache(BaseCache):
+    """Кэш-бэкенд поверх Redis, общий для всех процессов.
+
+    LOCATION задаётся URL вида redis://host:port/db. Целые числа
+    хранятся как есть, чтобы incr() выполнялся атомарно на сервере,
+    остальные значения сериализуются pickle.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        url = urlparse(server)
+        self._address = (url.hostname or 'localhost', url.port or 6379,
+                         int(url.path.strip('/') or 0))
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1)
+        self._local = threading.local()
+
+    @property
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = RedisClient(*self._address,
+                                 timeout=self._socket_timeout)
+            self._local.client = client
+        return client
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        return ['PX', max(int(timeout * 1000), 1)]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT and (
+                timeout <= 0):
+            return False
+        return self._client.execute(
+            'SET', key, self._encode(value), 'NX',
+            *self._expiry(timeout)) is not None
+
+    def get(self, key, default=None, version=None):
+        value = self._client.execute('GET', self._key(key, version))
+        return default if value is None else self._decode(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT and (
+                timeout <= 0):
+            self._client.execute('DEL', key)
+            return
+        self._client.execute('SET', key, self._encode(value),
+                             *self._expiry(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry:
+            return bool(self._client.execute('PEXPIRE', key, expiry[1]))
+        if not self._client.execute('EXISTS', key):
+            return False
+        self._client.execute('PERSIST', key)
+        return True
+
+    def delete(self, key, version=None):
+        self._client.execute('DEL', self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.execute(
+            'MGET', *(self._key(key, version) for key in keys))
+        return {key: self._decode(value)
+                for key, value in zip(keys, values) if value is not None}
+
+    def has_key(self, key, version=None):
+        return bool(self._client.execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        value = self._client.execute('EVAL', INCR_SCRIPT, 1, key, delta)
+        if value is None:
+            raise ValueError("Key '%s' not found" % key)
+        return value
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._client.execute('DEL', *keys)
+
+    def clear(self):
+        self._client.execute('FLUSHDB')
+
+
+class TwoLevelCache(BaseCache):
+    """Двухуровневый кэш: локальный LRU процесса перед общим хранилищем.
+
+    OPTIONS:
+        LOCAL — алиас локального кэша (обычно LocMemCache);
+        SHARED — алиас общего кэша (Redis или memcached);
+        LOCAL_TIMEOUT — сколько секунд значение живёт в локальном кэше
+        (но не дольше, чем в общем).
+
+    Записи и удаления идут в общий кэш и сбрасывают локальную копию
+    только в текущем процессе, поэтому другие процессы могут видеть
+    старое значение не дольше LOCAL_TIMEOUT секунд.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 2)
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.delete(key, version=version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self.local.set(key, value, self.local_timeout, version=version)
+        return value
+
+    def _local_timeout(self, timeout):
+        """Срок локальной копии значения, записанного в общий кэш
+        на timeout секунд; None — копию хранить нельзя."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        if timeout <= 0:
+            return None
+        return min(timeout, self.local_timeout)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        local_timeout = self._local_timeout(timeout)
+        if local_timeout is None:
+            self.local.delete(key, version=version)
+        else:
+            self.local.set(key, value, local_timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Локальная копия могла бы пережить новый, более короткий срок.
+        self.local.delete(key, version=version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self.local.delete(key, version=version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.local.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            if shared:
+                self.local.set_many(shared, self.local_timeout,
+                                    version=version)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_timeout = self._local_timeout(timeout)
+        if local_timeout is None:
+            self.local.delete_many(data, version=version)
+        else:
+            self.local.set_many(data, local_timeout, version=version)
+        return failed
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self.local.delete(key, version=version)
+        return value
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self.local.delete_many(keys, version=version)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+        self.local.close(**kwargs)
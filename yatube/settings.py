@@ -45,8 +45,10 @@ INSTALLED_APPS = [
     'posts',
     'users',
     'about',
+    'api',
     'sorl.thumbnail',
     'debug_toolbar',
+    'rest_framework',
     'rest_framework.authtoken',
 ]
 
@@ -56,7 +58,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.middleware.RateLimitHeadersMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -67,6 +71,8 @@ INTERNAL_IPS = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
@@ -159,11 +165,97 @@ CACHES = {
     }
 }
 
+# Общий для всех воркеров кэш: CACHE_URL=redis://host:6379/0 или
+# CACHE_URL=memcached://host:11211. Перед ним стоит локальный LRU-кэш
+# процесса, значения в котором живут CACHE_LOCAL_TIMEOUT секунд.
+CACHE_URL = os.environ.get('CACHE_URL')
+if CACHE_URL:
+    if CACHE_URL.startswith('memcached://'):
+        SHARED_CACHE = {
+            'BACKEND': (
+                'django.core.cache.backends.memcached.MemcachedCache'),
+            'LOCATION': CACHE_URL[len('memcached://'):],
+        }
+    else:
+        SHARED_CACHE = {
+            'BACKEND': 'yatube.cache.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.TwoLevelCache',
+            'OPTIONS': {
+                'LOCAL': 'local',
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': int(
+                    os.environ.get('CACHE_LOCAL_TIMEOUT', 2)),
+            },
+        },
+        'local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'shared': SHARED_CACHE,
+    }
+
+# Лента подписок: новые посты раскладываются по лентам подписчиков,
+# если у автора не больше TIMELINE_FANOUT_LIMIT подписчиков; посты более
+# популярных авторов читаются при открытии ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL_LIMIT = 500
+
+# Сколько секунд хранятся страницы для анонимных посетителей; изменения
+# моделей сбрасывают их раньше по суррогатным ключам.
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Первые SEARCH_CACHE_RESULTS результатов поискового запроса кэшируются
+# на SEARCH_CACHE_TIMEOUT секунд или до изменения индекса.
+SEARCH_CACHE_RESULTS = 1000
+SEARCH_CACHE_TIMEOUT = 60 * 5
+
+# Фоновые задачи posts.queue: миниатюры, поисковый индекс, ленты,
+# счётчики и сброс кэшей. Задачи складываются в таблицу для воркера
+# manage.py run_tasks; TASK_QUEUE=local выполняет их в процессе после
+# коммита (так работают тесты). Неудачная задача повторяется через
+# TASK_RETRY_DELAY * 2 ** (попытка - 1) секунд, не больше
+# TASK_MAX_ATTEMPTS раз; выполненные хранятся TASK_RETENTION секунд.
+# Задачи упавшего воркера возвращаются в очередь через TASK_TIMEOUT
+# секунд (на PostgreSQL — только если строку задачи никто не держит).
+TASK_QUEUE = os.environ.get('TASK_QUEUE', 'db')
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_TIMEOUT = 60 * 10
+TASK_RETENTION = 60 * 60 * 24 * 7
+
+# Ограничения загружаемых картинок проверяются по ходу загрузки, а их
+# перекодирование без метаданных идёт в воркере очереди задач.
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+
+# Бюджеты запросов «число/период» (s, m, h, d) на пользователя и на
+# IP-адрес, см. posts.ratelimit. Записи через сайт и API расходуют
+# общий бюджет, а scope api ограничивает все запросы к API. Бюджет
+# IP-адреса общий для всех пользователей за ним (офис, NAT), поэтому
+# он в разы больше бюджета одного пользователя.
+RATE_LIMITS = {
+    'post': {'user': '30/h', 'ip': '300/h'},
+    'comment': {'user': '120/h', 'ip': '1200/h'},
+    'follow': {'user': '200/h', 'ip': '2000/h'},
+    'api': {'user': '300/m', 'ip': '1200/m'},
+}
+
+# Сколько доверенных обратных прокси стоит перед приложением. Если
+# больше нуля, адрес клиента для бюджетов берётся из X-Forwarded-For.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.RateLimitThrottle',
+    ],
 }
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.test import TestCase
+from django.test.runner import DiscoverRunner
+
+# TestCase оборачивает класс и каждый тест в транзакции, которые
+# никогда не коммитятся, а в Django 2.2 нет captureOnCommitCallbacks.
+# Поэтому транзакции самого теста здесь не считаются: on_commit вне
+# atomic() приложения выполняется сразу, как в режиме autocommit,
+# а внутри — при успешном выходе из самого внешнего блока atomic()
+# приложения.
+_enter_atomics = TestCase._enter_atomics.__func__
+_rollback_atomics = TestCase._rollback_atomics.__func__
+_on_commit = BaseDatabaseWrapper.on_commit
+_atomic_exit = transaction.Atomic.__exit__
+
+
+def _mark_test_depth(aliases):
+    for alias in aliases:
+        connection = transaction.get_connection(alias)
+        connection.test_savepoints = (len(connection.savepoint_ids)
+                                      if connection.in_atomic_block
+                                      else None)
+
+
+def _outside_application_atomic(connection):
+    return (connection.in_atomic_block
+            and len(connection.savepoint_ids)
+            == getattr(connection, 'test_savepoints', None))
+
+
+def enter_atomics(cls):
+    atomics = _enter_atomics(cls)
+    _mark_test_depth(atomics)
+    return atomics
+
+
+def rollback_atomics(cls, atomics):
+    _rollback_atomics(cls, atomics)
+    _mark_test_depth(atomics)
+
+
+def on_commit(connection, func):
+    if _outside_application_atomic(connection):
+        func()
+    else:
+        _on_commit(connection, func)
+
+
+def atomic_exit(atomic, exc_type, exc_value, traceback):
+    connection = transaction.get_connection(atomic.using)
+    result = _atomic_exit(atomic, exc_type, exc_value, traceback)
+    if (_outside_application_atomic(connection)
+            and not connection.needs_rollback):
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, func in callbacks:
+            func()
+    return result
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты выполняют фоновые задачи в своём процессе после
+    «коммита» транзакции (TASK_QUEUE = 'local'), без воркера."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.TASK_QUEUE = 'local'
+        TestCase._enter_atomics = classmethod(enter_atomics)
+        TestCase._rollback_atomics = classmethod(rollback_atomics)
+        BaseDatabaseWrapper.on_commit = on_commit
+        transaction.Atomic.__exit__ = atomic_exit
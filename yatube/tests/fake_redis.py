@@ -0,0 +1,180 @@
+import socket
+import socketserver
+import threading
+import time
+
+from yatube.cache import INCR_SCRIPT
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections.append(self.connection)
+        while True:
+            try:
+                command = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            name, args = command[0].upper().decode(), command[1:]
+            handler = getattr(self.server, f'cmd_{name.lower()}', None)
+            if handler is None:
+                self.wfile.write(b'-ERR unknown command\r\n')
+                continue
+            with self.server.lock:
+                self.server.commands.append(name)
+                reply = handler(*args)
+                drop = self.server.drop_after_reply
+                self.server.drop_after_reply = False
+            if drop:
+                # Команда выполнена, но ответ до клиента не дошёл.
+                return
+            self.wfile.write(self.encode(reply))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            raise ConnectionError('Ожидался массив RESP')
+        command = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+    @classmethod
+    def encode(cls, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, Status):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, bytes):
+            return b'$%d\r\n%s\r\n' % (len(reply), reply)
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(
+                cls.encode(item) for item in reply)
+        raise TypeError(reply)
+
+
+class Status(str):
+    pass
+
+
+OK = Status('OK')
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Сервер в памяти, понимающий подмножество протокола Redis,
+    которым пользуется yatube.cache.RedisCache.
+
+    Запускается в фоновом потоке на свободном порту локального
+    интерфейса, так что тесты кэша не требуют настоящего Redis.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+        self.connections = []
+        self.drop_after_reply = False
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def drop_connections(self):
+        """Закрыть все соединения, как при перезапуске сервера."""
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def cmd_ping(self):
+        return Status('PONG')
+
+    def cmd_select(self, db):
+        return OK
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            self.expires[key] = time.monotonic() + milliseconds / 1000
+        return OK
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                deleted += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        value = int(self.data[key]) if self._alive(key) else 0
+        value += int(delta)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_eval(self, script, numkeys, *args):
+        if script.decode() != INCR_SCRIPT:
+            raise NotImplementedError(script)
+        key, delta = args
+        return self.cmd_incrby(key, delta) if self._alive(key) else None
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self._alive(key)
+                   and self.expires.pop(key, None) is not None)
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return OK
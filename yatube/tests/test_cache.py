@@ -0,0 +1,178 @@
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from yatube.tests.fake_redis import FakeRedisServer
+
+
+def shared_caches(url, local_timeout):
+    """Два «воркера» с собственными локальными кэшами и общим Redis."""
+    config = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': {
+            'BACKEND': 'yatube.cache.RedisCache',
+            'LOCATION': url,
+        },
+    }
+    for worker in ('a', 'b'):
+        config[f'local_{worker}'] = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'local-{worker}',
+        }
+        config[f'worker_{worker}'] = {
+            'BACKEND': 'yatube.cache.TwoLevelCache',
+            'OPTIONS': {
+                'LOCAL': f'local_{worker}',
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': local_timeout,
+            },
+        }
+    return config
+
+
+class RedisCacheTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().start()
+        cls.settings = override_settings(
+            CACHES=shared_caches(cls.server.url, local_timeout=0.2))
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.server.commands.clear()
+
+    def test_basic_operations(self):
+        """Redis-бэкенд поддерживает основные операции кэша Django."""
+        cache = caches['shared']
+        cache.set('post', {'text': 'Тестовый текст'})
+        cache.set_many({'a': 1, 'b': [2]})
+        checks = {
+            'get': (cache.get('post'), {'text': 'Тестовый текст'}),
+            'get_default': (cache.get('missing', 'default'), 'default'),
+            'get_many': (cache.get_many(['a', 'b', 'missing']),
+                         {'a': 1, 'b': [2]}),
+            'add_existing': (cache.add('a', 5), False),
+            'add_new': (cache.add('c', 5), True),
+            'has_key': (cache.has_key('c'), True),
+            'incr': (cache.incr('a', 10), 11),
+            'get_incremented': (cache.get('a'), 11),
+        }
+        for name, (value, expected) in checks.items():
+            with self.subTest(name=name):
+                self.assertEqual(value, expected)
+
+        cache.delete_many(['a', 'b'])
+        self.assertEqual(cache.get_many(['a', 'b']), {})
+        with self.assertRaises(ValueError):
+            cache.incr('a')
+
+    def test_timeouts(self):
+        """Ключи истекают по таймауту, нулевой таймаут удаляет ключ."""
+        cache = caches['shared']
+        cache.set('short', 'value', 0.05)
+        cache.set('forever', 'value', None)
+        cache.set('removed', 'value')
+        cache.set('removed', 'value', 0)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('forever'), 'value')
+        self.assertIsNone(cache.get('removed'))
+        self.assertTrue(cache.touch('forever', 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('forever'))
+
+    def test_incr_is_atomic(self):
+        """incr — одна команда сервера и не создаёт отсутствующий ключ."""
+        cache = caches['shared']
+        cache.set('counter', 1)
+        self.server.commands.clear()
+        self.assertEqual(cache.incr('counter', 2), 3)
+        self.assertEqual(self.server.commands, ['EVAL'])
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertFalse(cache.has_key('missing'))
+
+    def test_reconnects_only_before_sending(self):
+        """Закрытое сервером соединение заменяется до отправки команды,
+        а команда, ответ на которую потерян, не повторяется."""
+        cache = caches['shared']
+        cache.set('counter', 1)
+        self.server.drop_connections()
+        self.assertEqual(cache.get('counter'), 1)
+
+        self.server.drop_after_reply = True
+        with self.assertRaises(ConnectionError):
+            cache.incr('counter')
+        self.assertEqual(cache.get('counter'), 2)
+
+    def test_touch_drops_local_copy(self):
+        """touch через двухуровневый кэш не оставляет локальную копию
+        жить дольше нового срока."""
+        worker = caches['worker_a']
+        worker.set('key', 'value')
+        self.assertTrue(worker.touch('key', 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(worker.get('key'))
+
+    def test_local_copy_does_not_outlive_timeout(self):
+        """Локальная копия живёт не дольше срока в общем кэше,
+        а нулевой срок её удаляет."""
+        worker = caches['worker_a']
+        worker.set('short', 'value', 0.05)
+        worker.set_many({'many': 'value'}, 0.05)
+        worker.set('removed', 'value')
+        worker.set('removed', 'value', 0)
+        worker.set('forever', 'value', None)
+        time.sleep(0.1)
+        self.assertIsNone(worker.get('short'))
+        self.assertEqual(worker.get_many(['many']), {})
+        self.assertIsNone(worker.get('removed'))
+        self.assertEqual(worker.get('forever'), 'value')
+
+    def test_local_cache_absorbs_repeated_reads(self):
+        """Повторные чтения обслуживаются локальным кэшем процесса."""
+        worker = caches['worker_a']
+        worker.set('key', 'value')
+        self.server.commands.clear()
+        for _ in range(5):
+            self.assertEqual(worker.get('key'), 'value')
+        self.assertEqual(self.server.commands, [])
+
+    def test_writes_are_visible_to_other_workers(self):
+        """Запись одного воркера видна другому не позже LOCAL_TIMEOUT."""
+        worker_a, worker_b = caches['worker_a'], caches['worker_b']
+        worker_a.set('generation', 'first')
+        self.assertEqual(worker_b.get('generation'), 'first')
+
+        worker_a.set('generation', 'second')
+        self.assertEqual(worker_a.get('generation'), 'second')
+        time.sleep(0.3)
+        self.assertEqual(worker_b.get('generation'), 'second')
+
+        worker_a.delete('generation')
+        time.sleep(0.3)
+        self.assertIsNone(worker_b.get('generation'))
+
+    def test_get_many_fills_local_cache(self):
+        """get_many дочитывает из общего кэша только недостающие ключи."""
+        worker_a, worker_b = caches['worker_a'], caches['worker_b']
+        worker_a.set_many({'a': 1, 'b': 2})
+        self.assertEqual(worker_b.get('a'), 1)
+        self.server.commands.clear()
+        self.assertEqual(worker_b.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertEqual(self.server.commands, ['MGET'])
+        self.server.commands.clear()
+        self.assertEqual(worker_b.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.assertEqual(self.server.commands, [])
@@ -25,6 +25,7 @@ urlpatterns = [
     path("auth/", include('users.urls')),
     path("auth/", include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls')),
     path('about/', include('about.urls', namespace='about'))
 ]